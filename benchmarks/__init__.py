@@ -0,0 +1,2 @@
+from .runner import Benchmark, run_benchmarks, compare_results
+from .cases import get_benchmarks
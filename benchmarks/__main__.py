@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Runs the grammate microbenchmarks and prints or saves the results as JSON.
+# Run from the repository root:
+#   python -m benchmarks -o before.json
+#   python -m benchmarks -o after.json --compare before.json
+import argparse
+import json
+import sys
+
+from . import get_benchmarks, run_benchmarks, compare_results
+
+GROUPS = ('parse', 'lookup', 'get_text', 'load')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Grammate microbenchmarks')
+    parser.add_argument('patterns', nargs='*', help='only run the benchmarks matching these glob patterns')
+    parser.add_argument('-g', '--group', action='append', choices=GROUPS, help='only run the benchmarks of a group')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='measurements per benchmark (default: 5)')
+    parser.add_argument('-t', '--min-time', type=float, default=0.2,
+                        help='minimum duration of a measurement in seconds (default: 0.2)')
+    parser.add_argument('-o', '--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('-c', '--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--max-ratio', type=float,
+                        help='exit with status 1 when a benchmark is slower than the compared one by this ratio')
+    parser.add_argument('-l', '--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    benchmarks = get_benchmarks(args.group)
+    if args.list:
+        for benchmark in benchmarks:
+            print(benchmark.name)
+        return 0
+
+    def progress(name, result):
+        print(f"{name:<50} {result['min'] * 1e6:>12.3f}us", file=sys.stderr)
+
+    results = run_benchmarks(benchmarks, patterns=args.patterns, repeat=args.repeat, min_time=args.min_time,
+                             progress=progress)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = 0
+    print(f"\n{'benchmark':<50} {'baseline':>12} {'current':>12} {'ratio':>7}", file=sys.stderr)
+    for name, base, current, ratio in compare_results(baseline, results):
+        regression = args.max_ratio is not None and ratio > args.max_ratio
+        regressions += regression
+        print(f"{name:<50} {base * 1e6:>10.3f}us {current * 1e6:>10.3f}us {ratio:>6.2f}x{' !' if regression else ''}",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+__all__ = ['get_benchmarks']
+
+import atexit
+import shutil
+import tempfile
+from datetime import date
+
+from grammate import ConfigDict
+from grammate.parser import ExpressionParser, parse_arguments
+from grammate.config import load_locale_config, clear_parse_cache
+
+from .fixtures import EXAMPLE_LOCALES_DIR, make_template, make_nested_config, make_locale_chain, \
+    make_example_locale, write_locales, LocalizedDate
+from .runner import Benchmark
+
+TEMPLATE_LENGTHS = (100, 1000, 10000)
+EXPRESSION_COUNTS = (0, 10, 100)
+NESTING_DEPTHS = (1, 4, 8)
+CHAIN_LENGTHS = (1, 3, 6)
+
+GET_TEXT_CASES = [
+    ('plain', 'plain_text', dict()),
+    ('brace', 'greeting', dict(name='John')),
+    ('format_spec', 'price', dict(price=19.9)),
+    ('modifier_formatter', 'apples', dict(count=3, date=LocalizedDate(2021, 5, 4))),
+    ('chained_modifiers', 'chained', dict(count=3)),
+    ('chained_modifiers_long', 'chained_long', dict(count=3)),
+    ('builtin_date', '{date:%Y-%m-%d}', dict(date=date(2021, 5, 4))),
+]
+
+
+def parse_benchmarks():
+    # uncached parsing of a template, by length and expression count
+    for length in TEMPLATE_LENGTHS:
+        for expression_count in EXPRESSION_COUNTS:
+            if expression_count * 25 > length:
+                continue
+            template = make_template(length, expression_count)
+            yield Benchmark(f'parse/length={length}/expressions={expression_count}',
+                            lambda template=template: ExpressionParser().parse(template), group='parse')
+
+    yield Benchmark('parse/arguments', lambda: parse_arguments.__wrapped__("apple, $count, 'it''s', 2.5, yes"),
+                    group='parse')
+
+
+def lookup_benchmarks():
+    for depth in NESTING_DEPTHS:
+        config, key = make_nested_config(depth)
+        config_dict = ConfigDict(config)
+        yield Benchmark(f'config_get/depth={depth}', lambda c=config_dict, k=key: c[k], group='lookup')
+
+        indexed = ConfigDict(config)
+        indexed.build_index()
+        yield Benchmark(f'config_get/depth={depth}/flat_index', lambda c=indexed, k=key: c[k], group='lookup')
+
+    for length in CHAIN_LENGTHS:
+        locale = make_locale_chain(length)
+
+        def cold_lookup(locale=locale):
+            locale.lookup_cache.clear()
+            return locale.get('deep.key')
+
+        yield Benchmark(f'locale_get/chain={length}/cold', cold_lookup, group='lookup')
+        yield Benchmark(f'locale_get/chain={length}/cached', lambda locale=locale: locale.get('deep.key'),
+                        group='lookup')
+        yield Benchmark(f'locale_get/chain={length}/missing', lambda locale=locale: locale.get('missing.key'),
+                        group='lookup')
+
+
+def get_text_benchmarks():
+    for compile_templates in (False, True):
+        mode = 'compiled' if compile_templates else 'interpreted'
+        locale = make_example_locale(compile_templates)
+        for name, key, kwargs in GET_TEXT_CASES:
+            yield Benchmark(f'get_text/{mode}/{name}', lambda l=locale, k=key, kw=kwargs: l.get_text(k, **kw),
+                            group='get_text')
+
+        batch = [(key, kwargs) for _ in range(20) for _, key, kwargs in GET_TEXT_CASES]
+        yield Benchmark(f'render_many/{mode}/batch={len(batch)}', lambda l=locale, b=batch: l.render_many(b),
+                        group='get_text')
+        columns = dict(count=list(range(100)), date=[LocalizedDate(2021, 5, 4)] * 100)
+        yield Benchmark(f'render_columns/{mode}/rows=100', lambda l=locale, c=columns: l.render_columns('apples', c),
+                        group='get_text')
+
+    # first render of a key: parsed on demand, or parsed at load time (warm_templates)
+    for warm_templates in (False, True):
+        locale = make_example_locale()
+        if warm_templates:
+            locale.config.build_templates()
+
+        def first_render(locale=locale):
+            locale.template_cache.clear()
+            return locale.get_text('apples', count=3, date=LocalizedDate(2021, 5, 4))
+
+        yield Benchmark(f"get_text/first/{'warm' if warm_templates else 'cold'}", first_render, group='get_text')
+
+
+def load_benchmarks():
+    locales_dir = tempfile.mkdtemp(prefix='grammate-bench-')
+    atexit.register(shutil.rmtree, locales_dir, ignore_errors=True)
+    write_locales(locales_dir)
+
+    def cold_load(locale, directory, fallback_locale=None):
+        clear_parse_cache()
+        return load_locale_config(locale, locales_dir=directory, fallback_locale=fallback_locale)
+
+    yield Benchmark('load/example/en', lambda: cold_load('en', EXAMPLE_LOCALES_DIR), group='load')
+    yield Benchmark('load/example/ar_MA', lambda: cold_load('ar_MA', EXAMPLE_LOCALES_DIR), group='load')
+    yield Benchmark('load/generated/en', lambda: cold_load('en', locales_dir), group='load')
+    yield Benchmark('load/generated/l1', lambda: cold_load('l1', locales_dir, 'en'), group='load')
+    yield Benchmark('load/generated/l1/warm_templates',
+                    lambda: load_locale_config('l1', locales_dir=locales_dir, fallback_locale='en',
+                                               warm_templates=True), group='load')
+    yield Benchmark('load/generated/l1/parse_cache',
+                    lambda: load_locale_config('l1', locales_dir=locales_dir, fallback_locale='en'), group='load')
+
+
+SUITES = [parse_benchmarks, lookup_benchmarks, get_text_benchmarks, load_benchmarks]
+
+
+def get_benchmarks(groups=None) -> list['Benchmark']:
+    benchmarks = list()
+    for suite in SUITES:
+        benchmarks.extend(benchmark for benchmark in suite() if not groups or benchmark.group in groups)
+    return benchmarks
@@ -0,0 +1,107 @@
+__all__ = ['EXAMPLE_LOCALES_DIR', 'make_template', 'make_nested_config', 'make_locale_chain', 'make_example_locale',
+           'write_locales', 'LocalizedDate', 'plural']
+
+import os
+from dataclasses import dataclass
+from datetime import date
+
+import yaml
+
+from grammate import Locale, ConfigDict
+
+EXAMPLE_LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'locales')
+
+WORDS = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor'.split()
+EXPRESSIONS = ['{name}', '{price:.2f}', '[currency]', '[!plural:apple,$count]', '[$item]']
+
+
+def make_template(length: int, expression_count: int) -> str:
+    # about `length` characters of text with `expression_count` expressions spread evenly
+    expressions = [EXPRESSIONS[i % len(EXPRESSIONS)] for i in range(expression_count)]
+    text_length = max(0, length - sum(map(len, expressions)))
+    words, size, i = list(), 0, 0
+    while size < text_length:
+        words.append(WORDS[i % len(WORDS)])
+        size += len(words[-1]) + 1
+        i += 1
+    step = max(1, len(words) // (expression_count + 1))
+    for i, expression in enumerate(expressions):
+        words.insert(min(len(words), (i + 1) * step + i), expression)
+    return ' '.join(words)
+
+
+def make_nested_config(depth: int, width: int = 10) -> tuple[dict, str]:
+    # a config `width` keys wide at each level, and the dotted key of its deepest leaf
+    config = {'value': 'found'}
+    key = 'value'
+    for level in reversed(range(depth)):
+        config = {f'k{level}_{i}': config if i == width - 1 else f'leaf {level} {i}' for i in range(width)}
+        key = f'k{level}_{width - 1}.{key}'
+    return config, key
+
+
+@dataclass
+class LocalizedDate:
+    year: int
+    month: int
+    day: int
+
+    def __localized_format__(self, locale, fmt='long'):
+        fmt = locale.get(f'date.format.{fmt}', default='%Y-%m-%d')
+        dt = date(self.year, self.month, self.day)
+        fmt = fmt.replace('%A', locale.get(f'date.week_day.{dt.weekday()}', default='%A'))
+        fmt = fmt.replace('%B', locale.get(f'date.months.{dt.month}', default='%B'))
+        return dt.strftime(fmt)
+
+
+def plural(locale, singular, value, *args):
+    form = locale.get(singular, default=singular)
+    if value != 1:
+        form = locale.get(singular + '.plural', default=form + 's')
+    return form if 'without_value' in args else f'{value} {form}'
+
+
+def make_locale_chain(length: int, compile_templates: bool = False) -> 'Locale':
+    # a chain of `length` locales, the keys being defined by the last fallback only
+    locale = None
+    for i in range(length):
+        config = {'greeting': 'Hello {name}!', 'deep': {'key': 'value'}} if i == 0 else {f'only_{i}': str(i)}
+        locale = Locale(ConfigDict(config), fallback_locale=locale, compile_templates=compile_templates)
+    return locale
+
+
+def make_example_locale(compile_templates: bool = False) -> 'Locale':
+    # a locale like the ones of tests/example.py, with the modifiers and formatters registered
+    config = {
+        'greeting': 'Hello {name}!',
+        'price': 'Total: {price:.2f} [currency]',
+        'currency': 'USD',
+        'apple': 'apple',
+        'apples': 'I have [!plural:apple,$count] since {date:long}.',
+        'chained': 'I have [!count_of:apple,$count].',
+        'chained_long': f"{make_template(5000, 0)} [!count_of:apple,$count] {make_template(5000, 0)}",
+        'date': {
+            'format': {'long': '%A, %B %d, %Y', 'short': '%Y-%m-%d'},
+            'week_day': dict(enumerate(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])),
+            'months': {i + 1: name for i, name in enumerate(['January', 'February', 'March', 'April', 'May', 'June',
+                                                             'July', 'August', 'September', 'October', 'November',
+                                                             'December'])},
+        },
+    }
+    locale = Locale(ConfigDict(config), compile_templates=compile_templates)
+    locale.register_modifier('plural', plural)
+    # chained modifiers: the output of count_of is expanded again
+    locale.register_modifier('count_of', lambda locale, word, value: f'[!plural:{word},{value}]')
+    return locale
+
+
+def write_locales(locales_dir: str, locale_count: int = 20, key_count: int = 500):
+    # writes en.yaml and locale_count - 1 other locales falling back on it, each defining half the keys
+    os.makedirs(locales_dir, exist_ok=True)
+    for i in range(locale_count):
+        locale_id = 'en' if i == 0 else f'l{i}'
+        config = {f'section{j % 20}': dict() for j in range(0, key_count, 2 if i else 1)}
+        for j in range(0, key_count, 2 if i else 1):
+            config[f'section{j % 20}'][f'key{j}'] = make_template(60, j % 3)
+        with open(os.path.join(locales_dir, f'{locale_id}.yaml'), 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config, f, allow_unicode=True)
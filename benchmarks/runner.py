@@ -0,0 +1,66 @@
+__all__ = ['Benchmark', 'run_benchmarks', 'compare_results']
+
+import fnmatch
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    func: Callable[[], object]
+    group: str = ''
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_benchmark(benchmark: 'Benchmark', repeat: int = 5, min_time: float = 0.2) -> dict:
+    timer = timeit.Timer(benchmark.func)
+    number, _ = timer.autorange()
+    # autorange targets 0.2s per measurement
+    number = max(1, int(number * min_time / 0.2))
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return dict(group=benchmark.group, number=number, repeat=repeat, min=min(timings),
+                median=statistics.median(timings), mean=statistics.fmean(timings),
+                stdev=statistics.stdev(timings) if len(timings) > 1 else 0.0)
+
+
+def run_benchmarks(benchmarks: Iterable['Benchmark'], patterns: Iterable[str] = (), repeat: int = 5,
+                   min_time: float = 0.2, progress: Optional[Callable[[str, dict], None]] = None) -> dict:
+    patterns = list(patterns)
+    results = dict()
+    for benchmark in benchmarks:
+        if patterns and not any(fnmatch.fnmatchcase(benchmark.name, pattern) for pattern in patterns):
+            continue
+        results[benchmark.name] = time_benchmark(benchmark, repeat=repeat, min_time=min_time)
+        if progress:
+            progress(benchmark.name, results[benchmark.name])
+
+    return dict(
+        meta=dict(python=sys.version.split()[0], implementation=platform.python_implementation(),
+                  platform=platform.platform(), revision=_git_revision(),
+                  timestamp=time.strftime('%Y-%m-%dT%H:%M:%S%z'), repeat=repeat),
+        results=results,
+    )
+
+
+def compare_results(baseline: dict, current: dict, stat: str = 'min') -> list[tuple[str, float, float, float]]:
+    # (name, baseline time, current time, current / baseline) of the benchmarks present in both results
+    comparison = list()
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is not None and base[stat] > 0:
+            comparison.append((name, base[stat], result[stat], result[stat] / base[stat]))
+    return comparison
@@ -1,5 +1,10 @@
 from .globals import setup_locale, get_locale, get, get_default_locale, get_text, get_modifier, get_formatter, \
-    register_formatter, register_modifier, format, apply_modifier, formatter, modifier
+    register_formatter, register_modifier, format, apply_modifier, formatter, modifier, preload_locales, \
+    reload_locale, reload_changed_locales, render_many, iter_text, render_to, \
+    render_columns
 from .model import Locale, BaseLocale, ProxyLocale
+from .context import ContextLocale, use_locale, get_bound_locale
 from .parser import *
 from .config import *
+from .watcher import LocaleWatcher, watch_locales
+from .instrumentation import Instrumentation, instrument, uninstrument
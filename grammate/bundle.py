@@ -0,0 +1,88 @@
+__all__ = ['read_bundle', 'write_bundle', 'get_bundle_path', 'get_mtime', 'write_file_atomically', 'relative_sources',
+           'resolve_sources', 'BUNDLE_VERSION']
+
+import os
+import pickle
+import tempfile
+from typing import Callable, Optional
+
+BUNDLE_MAGIC = b'GRAMMATE-BUNDLE\n'
+BUNDLE_VERSION = 3
+
+
+def get_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def relative_sources(sources: dict, base_dir: str) -> dict:
+    # source paths are stored relative to the locales directory, so that a compiled directory can be moved
+    return {os.path.relpath(path, base_dir): mtime for path, mtime in sources.items()}
+
+
+def resolve_sources(sources: dict, base_dir: str) -> dict:
+    return {os.path.abspath(os.path.join(base_dir, path)): mtime for path, mtime in sources.items()}
+
+
+def get_bundle_path(bundle_dir: str, locale: str, fallback_locale: Optional[str] = None) -> str:
+    name = f'{locale}@{fallback_locale}' if fallback_locale else locale
+    return os.path.join(bundle_dir, f'{name}.bundle')
+
+
+def read_bundle(bundle_path: str, base_dir: str = '.', check_sources: bool = True, **expected) -> Optional[dict]:
+    # returns None when the bundle is missing, unreadable, built with different settings (expected header values)
+    # or stale: any source file (including files that did not exist) has changed since it was written. Source paths
+    # are resolved against base_dir. check_sources=False trusts the bundle without checking its sources, e.g. for
+    # bundles deployed with the application whose files do not keep their modification times.
+    try:
+        with open(bundle_path, 'rb') as f:
+            if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                return None
+            bundle = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, TypeError):
+        return None
+
+    if not isinstance(bundle, dict) or bundle.get('version') != BUNDLE_VERSION:
+        return None
+    if any(bundle['header'].get(key) != value for key, value in expected.items()):
+        return None
+    bundle['sources'] = resolve_sources(bundle['sources'], base_dir)
+    if check_sources and any(get_mtime(path) != mtime for path, mtime in bundle['sources'].items()):
+        return None
+
+    return bundle
+
+
+def write_file_atomically(path: str, write: Callable) -> bool:
+    # write(f) fills a temporary file of its own, which then replaces path: threads of a process may write the same
+    # file concurrently. Returns False when the file cannot be written, e.g. on a read-only file system.
+    tmp_path = None
+    try:
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+def write_bundle(bundle_path: str, sources: dict, header: dict, base_dir: str = '.', **payload) -> bool:
+    bundle = dict(version=BUNDLE_VERSION, header=header, sources=relative_sources(sources, base_dir), **payload)
+
+    def write(f):
+        f.write(BUNDLE_MAGIC)
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # the bundle is only an optimization, it is not written on failure
+    return write_file_atomically(bundle_path, write)
@@ -0,0 +1,44 @@
+__all__ = ['LRUCache']
+
+from collections import OrderedDict
+from typing import Optional
+
+
+class LRUCache:
+    def __init__(self, maxsize: Optional[int] = 1024):
+        # maxsize=None means unbounded, maxsize=0 disables caching
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        try:
+            self._data.move_to_end(key)
+        except KeyError:  # evicted by another thread
+            pass
+        return value
+
+    def __setitem__(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                pass
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
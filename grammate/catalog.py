@@ -0,0 +1,149 @@
+__all__ = ['MappedCatalog', 'open_catalog', 'write_catalog', 'get_catalog_path']
+
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Optional
+
+from .bundle import get_mtime, write_file_atomically, relative_sources, resolve_sources
+
+CATALOG_MAGIC = b'GRAMMATE-CATALOG'
+CATALOG_VERSION = 3
+# magic, version, slot count, table offset, meta offset, meta length
+HEADER = struct.Struct('<16sIIQQQ')
+# key hash, value type, key length, value length, key offset, value offset
+SLOT = struct.Struct('<IBIIQQ')
+# dicts and lists are stored as their keys or length, their values being the entries of the dotted child keys (values
+# not matching them, e.g. shadowed by a flat "a.b" key, are stored inline)
+EMPTY, STR, PICKLE, DICT, LIST = 0, 1, 2, 3, 4
+_MISSING = object()
+
+
+def get_catalog_path(catalog_dir: str, locale: str, fallback_locale: Optional[str] = None) -> str:
+    name = f'{locale}@{fallback_locale}' if fallback_locale else locale
+    return os.path.join(catalog_dir, f'{name}.catalog')
+
+
+class MappedCatalog(Mapping):
+    # Read-only replacement of ConfigDict backed by a memory-mapped file: a hash table of dotted keys pointing to
+    # encoded values. Pages are shared between all processes mapping the same file, values are decoded on access.
+    def __init__(self, catalog_path: str):
+        with open(catalog_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slot_count, self.table_offset, meta_offset, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            raise ValueError(f"{catalog_path} is not a catalog of version {CATALOG_VERSION}")
+        meta = pickle.loads(self._mm[meta_offset:meta_offset + meta_len])
+        self.top_level_keys = meta['keys']
+        self.header = meta['header']
+        self.sources = meta['sources']
+        self.index = None
+        self.templates = None
+
+    def __getitem__(self, k):
+        value = self._get(k)
+        if value is _MISSING:
+            # integer parts are stored in their canonical form: "date.months.05" is "date.months.5", as in ConfigDict
+            canonical = '.'.join(str(int(part)) if part.isdecimal() else part for part in k.split('.'))
+            value = self._get(canonical) if canonical != k else _MISSING
+        return None if value is _MISSING else value
+
+    def _get(self, k):
+        key = k.encode('utf-8')
+        key_hash = zlib.crc32(key)
+        mask = self.slot_count - 1
+        i = key_hash & mask
+        while True:
+            slot_hash, value_type, key_len, value_len, key_offset, value_offset = \
+                SLOT.unpack_from(self._mm, self.table_offset + i * SLOT.size)
+            if value_type == EMPTY:
+                return _MISSING
+            if slot_hash == key_hash and key_len == len(key) and self._mm[key_offset:key_offset + key_len] == key:
+                raw = self._mm[value_offset:value_offset + value_len]
+                if value_type == STR:
+                    return raw.decode('utf-8')
+                value = pickle.loads(raw)
+                if value_type == DICT:
+                    children, inline = value
+                    return {child: inline[child] if child in inline else self[f'{k}.{child}'] for child in children}
+                if value_type == LIST:
+                    length, inline = value
+                    return [inline[i] if i in inline else self[f'{k}.{i}'] for i in range(length)]
+                return value
+            i = (i + 1) & mask
+
+    def __len__(self):
+        return len(self.top_level_keys)
+
+    def __iter__(self):
+        return iter(self.top_level_keys)
+
+    def close(self):
+        self._mm.close()
+
+
+def _get_inline_children(index: dict, key: str, children) -> dict:
+    return {child: value for child, value in children if index.get(f'{key}.{child}') != value}
+
+
+def write_catalog(catalog_path: str, config, header: Optional[dict] = None, base_dir: str = '.') -> bool:
+    index = config.index if config.index is not None else config.build_index()
+    slot_count = 8
+    while slot_count < 2 * len(index):
+        slot_count *= 2
+
+    table_offset = HEADER.size
+    data = bytearray()
+    data_offset = table_offset + slot_count * SLOT.size
+    slots = [None] * slot_count
+    for k, value in index.items():
+        key = k.encode('utf-8')
+        if isinstance(value, str):
+            value_type, raw = STR, value.encode('utf-8')
+        elif isinstance(value, dict):
+            value_type, raw = DICT, pickle.dumps((list(value), _get_inline_children(index, k, value.items())),
+                                                 protocol=pickle.HIGHEST_PROTOCOL)
+        elif isinstance(value, list):
+            value_type, raw = LIST, pickle.dumps((len(value), _get_inline_children(index, k, enumerate(value))),
+                                                 protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            value_type, raw = PICKLE, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        key_hash = zlib.crc32(key)
+        i = key_hash & (slot_count - 1)
+        while slots[i] is not None:
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = (key_hash, value_type, len(key), len(raw), data_offset + len(data),
+                    data_offset + len(data) + len(key))
+        data += key
+        data += raw
+
+    meta = pickle.dumps(dict(keys=list(config), header=header or dict(),
+                             sources=relative_sources(config.sources, base_dir)), protocol=pickle.HIGHEST_PROTOCOL)
+    meta_offset = data_offset + len(data)
+
+    def write(f):
+        f.write(HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, slot_count, table_offset, meta_offset, len(meta)))
+        for slot in slots:
+            f.write(SLOT.pack(*slot) if slot else SLOT.pack(0, EMPTY, 0, 0, 0, 0))
+        f.write(data)
+        f.write(meta)
+
+    return write_file_atomically(catalog_path, write)
+
+
+def open_catalog(catalog_path: str, base_dir: str = '.', check_sources: bool = True,
+                 **expected) -> Optional[MappedCatalog]:
+    # returns None when the catalog is missing, invalid, built with different settings or stale (see read_bundle)
+    try:
+        catalog = MappedCatalog(catalog_path)
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+    catalog.sources = resolve_sources(catalog.sources, base_dir)
+    if any(catalog.header.get(key) != value for key, value in expected.items()) or \
+            check_sources and any(get_mtime(path) != mtime for path, mtime in catalog.sources.items()):
+        catalog.close()
+        return None
+    return catalog
@@ -0,0 +1,77 @@
+__all__ = ['compile_locales', 'main']
+
+import argparse
+import os
+import sys
+from typing import Iterable, Optional
+
+import yaml
+
+
+def compile_locales(locales_dir: str, bundle_dir: Optional[str] = None, locale_ids: Optional[Iterable[str]] = None,
+                    flat_index: bool = False) -> tuple[dict[str, str], list[tuple[str, str, str]]]:
+    # Writes the bundle of each locale (all the locales of locales_dir by default) and of its fallback chain, with
+    # inheritance resolved and every string parsed. Returns the bundle paths by locale id and the malformed
+    # expressions found as (locale id, key, expression).
+    from .config import compile_locale_bundle, list_locale_ids
+    from . import config
+    from .globals import _get_fallback_locale_id
+
+    ordered = list()
+
+    def visit(locale_id):
+        if locale_id in ordered:
+            return
+        fallback_id = _get_fallback_locale_id(locale_id, None, config.default_locale_id)
+        if fallback_id:
+            visit(fallback_id)
+        ordered.append(locale_id)
+
+    for locale_id in list_locale_ids(locales_dir) if locale_ids is None else locale_ids:
+        visit(locale_id)
+
+    bundle_paths, malformed = dict(), list()
+    for locale_id in ordered:
+        errors = list()
+        bundle_paths[locale_id] = compile_locale_bundle(locale_id, locales_dir=locales_dir, bundle_dir=bundle_dir,
+                                                        flat_index=flat_index, errors=errors)
+        malformed.extend((locale_id, key, expression) for key, expression in errors)
+    return bundle_paths, malformed
+
+
+def main(argv=None):
+    from .config import set_default_locale_id, default_locale_id
+
+    parser = argparse.ArgumentParser(prog='grammate', description='Grammate locale tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compile_parser = commands.add_parser(
+        'compile', help='compile a locales directory into bundles loaded by setup_locale(bundle_dir=...)')
+    compile_parser.add_argument('locales_dir', help='directory of the locale yaml files')
+    compile_parser.add_argument('-o', '--output', help='bundle directory (default: <locales_dir>/.bundles)')
+    compile_parser.add_argument('-d', '--default-locale', default=default_locale_id,
+                                help=f'default locale of the application (default: {default_locale_id})')
+    compile_parser.add_argument('-l', '--locale', action='append', help='only compile this locale and its fallbacks')
+    compile_parser.add_argument('--flat-index', action='store_true', help='include the flat key index')
+    compile_parser.add_argument('-q', '--quiet', action='store_true', help='only report malformed expressions')
+    args = parser.parse_args(argv)
+
+    set_default_locale_id(args.default_locale)
+    bundle_dir = args.output or os.path.join(args.locales_dir, '.bundles')
+    try:
+        bundle_paths, malformed = compile_locales(args.locales_dir, bundle_dir, locale_ids=args.locale,
+                                                  flat_index=args.flat_index)
+    except (OSError, ValueError, yaml.YAMLError) as e:  # missing directory, invalid yaml, unwritable bundle...
+        print(f"grammate: {e}", file=sys.stderr)
+        return 2
+
+    if not args.quiet:
+        for locale_id, bundle_path in bundle_paths.items():
+            print(f"{locale_id}: {bundle_path}")
+    for locale_id, key, expression in malformed:
+        print(f"{locale_id}: {key}: malformed expression {expression!r}", file=sys.stderr)
+    # bundles are written either way, malformed expressions are rendered as literal text
+    return 1 if malformed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
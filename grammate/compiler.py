@@ -0,0 +1,52 @@
+__all__ = ['compile_template']
+
+from typing import Callable, Iterable, Union
+
+from .parser import BraceExpression, BracketExpression
+
+
+def compile_template(parts: Iterable[Union[str, BraceExpression, BracketExpression]]) -> Callable[..., str]:
+    # Builds `render(locale, kwargs, depth) -> str` doing the same work as Locale.render_parts, without
+    # dispatching on the part types at render time. Expression outputs go through locale._expand_output.
+    constants = dict()
+    uses = set()
+    pieces = list()
+
+    def constant(value):
+        name = f'_c{len(constants)}'
+        constants[name] = value
+        return name
+
+    for part in parts:
+        if isinstance(part, BraceExpression):
+            uses.add('format')
+            pieces.append(f'expand(format(kwargs.get({part.formatted_obj!r}), {part.format_spec!r}), kwargs, depth)')
+        elif isinstance(part, BracketExpression):
+            if part.special == '!':
+                uses.add('apply_modifier')
+                args = [f'kwargs.get({arg[1:]!r})' if isinstance(arg, str) and arg[:1] == '$' else constant(arg)
+                        for arg in part.args or ()]
+                pieces.append(f'expand(apply_modifier({", ".join([repr(part.stem)] + args)}), kwargs, depth)')
+            elif part.special == '$':
+                uses.add('get')
+                pieces.append(f'expand(get(_key := kwargs.get({part.stem!r}, {part.stem!r}), _key), kwargs, depth)')
+            else:
+                uses.add('get')
+                pieces.append(f'expand(get({part.stem!r}, {part.stem!r}), kwargs, depth)')
+        else:
+            pieces.append(repr(part))
+
+    lines = ['def render(locale, kwargs, depth=0):']
+    if uses:
+        lines.append('    expand = locale._expand_output')
+    lines.extend(f'    {name} = locale.{name}' for name in sorted(uses))
+    if not pieces:
+        lines.append("    return ''")
+    elif len(pieces) == 1 and not uses:
+        lines.append(f'    return {pieces[0]}')
+    else:
+        lines.append(f"    return ''.join(({', '.join(pieces)},))")
+
+    namespace = dict(constants)
+    exec(compile('\n'.join(lines), '<grammate template>', 'exec'), namespace)
+    return namespace['render']
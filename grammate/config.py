@@ -1,30 +1,145 @@
-__all__ = ['flatten_config', 'merge_dicts', 'load_locale_config', 'ConfigDict', 'default_locale_id',
-           'DEFAULT_CONFIG_DIR']
+__all__ = ['flatten_config', 'merge_dicts', 'load_locale_config', 'ConfigDict', 'OverlayDict', 'default_locale_id',
+           'DEFAULT_CONFIG_DIR', 'compile_locale_bundle', 'list_locale_ids']
 
-from typing import Optional
+from typing import Callable, Iterable, Optional, Union
 import yaml
 import os
+import hashlib
+import time
 from collections.abc import Mapping
 import re
+import sys
+
+from .bundle import read_bundle, write_bundle, get_bundle_path, get_mtime
+from .catalog import MappedCatalog, open_catalog, write_catalog, get_catalog_path
+from .parser import ExpressionParser, is_plain_text
 
 DEFAULT_CONFIG_DIR = 'locales'
 default_locale_id = 'en'
 _INTEGER_REGEX = re.compile(r'^\d+$')
+_DIGIT_REGEX = re.compile(r'\d')
+_MISSING = object()
+# absolute path -> (content hash, parsed yaml) of the last parsed version of each file, shared by every load of the
+# process: parsed trees are never mutated, loads build new dicts for what they change (see merge_dicts and
+# resolve_inheritance). A file is parsed again, replacing its entry, when its content changes.
+_parse_cache: dict[str, tuple[str, Optional[dict]]] = dict()
+
+
+class OverlayDict(Mapping):
+    # Read-only view of dicts merged as merge_dicts would merge them, the first layer overriding the next ones.
+    # Layers are shared, not copied: a locale only stores its own overrides above the parsed trees of its parents.
+    __slots__ = ('layers',)
+
+    def __init__(self, layers: Iterable[Mapping]):
+        self.layers = tuple(layers)
+
+    def __getitem__(self, k):
+        found = list()
+        for layer in self.layers:
+            value = layer.get(k, _MISSING)
+            if value is _MISSING:
+                continue
+            if not isinstance(value, _DICT_TYPES):
+                # a dict overrides what is below it, anything else overrides and is overridden as a whole
+                if found:
+                    break
+                return value
+            found.append(value)
+        if not found:
+            raise KeyError(k)
+        return found[0] if len(found) == 1 else OverlayDict(found)
+
+    def __contains__(self, k):
+        return any(k in layer for layer in self.layers)
+
+    def __iter__(self):
+        # same order as merge_dicts: keys of the lowest layer first
+        seen = set()
+        for layer in reversed(self.layers):
+            for k in layer:
+                if k not in seen:
+                    seen.add(k)
+                    yield k
+
+    def __len__(self):
+        return len(set().union(*self.layers))
+
+    def __reduce__(self):
+        # pickled (e.g. in bundles) as the plain merged dict
+        return dict, (to_dict(self),)
+
+
+_DICT_TYPES = (dict, OverlayDict)
+
+
+def to_dict(value):
+    # plain dicts of overlays, their nested overlays included
+    if isinstance(value, OverlayDict):
+        return {k: to_dict(v) for k, v in value.items()}
+    return value
+
+
+def _copy_tree(value):
+    # subtrees are returned as copies: the parsed files they come from are shared by every load using them
+    if isinstance(value, _DICT_TYPES):
+        return {k: _copy_tree(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_tree(v) for v in value]
+    return value
 
 
 class ConfigDict(Mapping):
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, index: Optional[dict] = None, sources: Optional[dict] = None,
+                 namespaces: Iterable[str] = (), namespace_loader: Optional[Callable[[str], tuple]] = None,
+                 templates: Optional[dict] = None):
         self.config = config
+        self.index = index
+        # text -> parsed template, for the strings parsed ahead of time (see build_templates)
+        self.templates = templates
+        # yaml files (absolute path -> mtime, None if missing) the configuration was built from
+        self.sources = sources or dict()
+        # top level keys sharded in <locales_dir>/<locale>/<namespace>.yaml files, loaded on first access by
+        # namespace_loader(namespace) -> (value, sources)
+        self.pending_namespaces = set(namespaces)
+        self.namespace_loader = namespace_loader
 
     def __getitem__(self, k):
+        if self.index is not None:
+            value = self.index.get(k, _MISSING)
+            if value is not _MISSING:
+                return _copy_tree(value)
+            # only keys with integer parts (e.g. "month.plural.01") can resolve outside the index
+            if not _DIGIT_REGEX.search(k):
+                return None
+        if self.pending_namespaces:
+            namespace = k.partition('.')[0]
+            if namespace in self.pending_namespaces:
+                self.load_namespace(namespace)
         key_path = tuple(k.split('.'))
-        return ConfigDict.config_get(self.config, key_path)
+        return _copy_tree(ConfigDict.config_get(self.config, key_path))
 
     def __len__(self):
-        return self.config.__len__()
+        return len(self.config) + sum(1 for namespace in self.pending_namespaces if namespace not in self.config)
 
     def __iter__(self):
-        return self.config.__iter__()
+        yield from self.config
+        yield from (namespace for namespace in self.pending_namespaces if namespace not in self.config)
+
+    def load_namespace(self, namespace: str):
+        value, sources = self.namespace_loader(namespace)
+        # copy-on-write, readers of the previous config are not affected
+        config = dict(self.config)
+        if value is None:
+            config.pop(namespace, None)
+        else:
+            config[namespace] = value
+        self.config = config
+        self.sources.update(sources)
+        self.pending_namespaces.discard(namespace)
+
+    def load_namespaces(self):
+        for namespace in list(self.pending_namespaces):
+            self.load_namespace(namespace)
 
     @staticmethod
     def config_get(obj: dict, key_path: tuple[str]):
@@ -35,7 +150,7 @@ class ConfigDict(Mapping):
             stem_key = '.'.join(stem)
             if stem_key in obj:
                 value = obj[stem_key]
-                if len(child) == 1 and isinstance(value, dict):
+                if len(child) == 1 and isinstance(value, _DICT_TYPES):
                     if child[0] in value:
                         return value[child[0]]
                     elif _INTEGER_REGEX.match(child[0]) and int(child[0]) in value:
@@ -44,12 +159,65 @@ class ConfigDict(Mapping):
 
                 elif len(child) == 1 and isinstance(value, list):
                     return value[int(child[0])]
-                elif child and isinstance(value, dict):
+                elif child and isinstance(value, _DICT_TYPES):
                     return ConfigDict.config_get(value, child)
                 elif not child:
                     return value
         return None
 
+    def build_index(self) -> dict:
+        self.load_namespaces()
+        index = dict()
+        for key in _iter_index_keys(self.config):
+            if key in index:
+                continue
+            try:
+                value = ConfigDict.config_get(self.config, tuple(key.split('.')))
+            except (ValueError, IndexError, TypeError):
+                continue
+            if value is not None:
+                index[key] = to_dict(value)
+        self.index = index
+        return index
+
+    def build_templates(self, errors: Optional[list] = None) -> dict:
+        # parses every string value once, as Locale.parse_template would. The malformed expressions found, kept as
+        # literal text by the parser, are appended to errors as (key, expression) pairs.
+        self.load_namespaces()
+        templates, malformed = dict(), dict()
+        for key, value in _iter_string_values(self.config):
+            if is_plain_text(value):
+                continue
+            if value not in templates:
+                parser = ExpressionParser()
+                result, resolved = parser.parse(value)
+                templates[value] = tuple(result), resolved
+                malformed[value] = parser.errors
+            if errors is not None:
+                errors.extend((key, expression) for expression in malformed[value])
+        self.templates = templates
+        return templates
+
+
+def _iter_string_values(obj, parent_key: str = ''):
+    items = enumerate(obj) if isinstance(obj, list) else obj.items()
+    for k, v in items:
+        new_key = f"{parent_key}.{k}" if parent_key else str(k)
+        if isinstance(v, str):
+            yield new_key, v
+        elif isinstance(v, (list,) + _DICT_TYPES):
+            yield from _iter_string_values(v, new_key)
+
+
+def _iter_index_keys(obj: dict, parent_key: str = ''):
+    for k, v in obj.items():
+        new_key = f"{parent_key}.{k}" if parent_key else str(k)
+        yield new_key
+        if isinstance(v, _DICT_TYPES):
+            yield from _iter_index_keys(v, new_key)
+        elif isinstance(v, list):
+            yield from (f"{new_key}.{i}" for i in range(len(v)))
+
 
 def set_default_locale_id(locale):
     global default_locale_id
@@ -60,7 +228,7 @@ def flatten_config(obj: dict, parent_key: str = '', ) -> dict:
     items = {}
     for k, v in obj.items():
         new_key = f"{parent_key}.{k}" if parent_key else k
-        if isinstance(v, dict):
+        if isinstance(v, _DICT_TYPES):
             items.update(flatten_config(v, new_key, ))
         else:
             items[new_key] = v
@@ -68,15 +236,89 @@ def flatten_config(obj: dict, parent_key: str = '', ) -> dict:
 
 
 def _load_single(yaml_path: str) -> Optional[dict]:
-    if os.path.exists(yaml_path):
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    return None
+    return parse_locale_file(yaml_path)[1]
+
+
+def parse_locale_file(yaml_path: str) -> tuple[Optional[str], Optional[dict], float]:
+    # returns the content hash, the (cached) parsed yaml and the time spent
+    start = time.perf_counter()
+    cache_key = os.path.abspath(yaml_path)
+    if not os.path.exists(yaml_path):
+        _parse_cache.pop(cache_key, None)
+        return None, None, time.perf_counter() - start
 
+    with open(yaml_path, 'rb') as f:
+        content = f.read()
+    content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+    cached = _parse_cache.get(cache_key)
+    if cached is None or cached[0] != content_hash:
+        cached = _parse_cache[cache_key] = content_hash, _intern_strings(yaml.safe_load(content))
+    return content_hash, cached[1], time.perf_counter() - start
 
-def _load_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR):
+
+def _intern_strings(value):
+    # the same strings (keys and values) repeated across locale files are stored once
+    if isinstance(value, dict):
+        return {sys.intern(k) if isinstance(k, str) else k: _intern_strings(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_strings(v) for v in value]
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def store_parsed_file(yaml_path: str, content_hash: str, config: Optional[dict]):
+    # adds a file parsed by another process to the parse cache
+    cache_key = os.path.abspath(yaml_path)
+    cached = _parse_cache.get(cache_key)
+    if cached is None or cached[0] != content_hash:
+        _parse_cache[cache_key] = content_hash, config
+
+
+def clear_parse_cache():
+    _parse_cache.clear()
+
+
+def _load_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR, sources: Optional[dict] = None,
+                 namespaces: Optional[tuple] = None):
+    # namespaces=None loads the locale file, otherwise only the given top level keys are loaded, from the locale
+    # file and the namespace files (<locales_dir>/<locale>/<namespace>.yaml). None if the locale has neither.
     locale_path = os.path.join(locales_dir, f'{locale}.yaml')
-    return _load_single(locale_path)
+    if sources is not None:
+        sources[os.path.abspath(locale_path)] = get_mtime(locale_path)
+    config = _load_single(locale_path)
+    locale_dir = os.path.join(locales_dir, locale)
+    if config is None and not os.path.isdir(locale_dir):
+        return None
+    if namespaces is None:
+        return config if config is not None else dict()
+
+    config = {key: value for key, value in (config or dict()).items() if key in namespaces or key == '$extends'}
+    for namespace in namespaces:
+        namespace_path = os.path.join(locale_dir, f'{namespace}.yaml')
+        if sources is not None:
+            sources[os.path.abspath(namespace_path)] = get_mtime(namespace_path)
+        value = _load_single(namespace_path)
+        if value is None:
+            continue
+        if isinstance(value, dict) and isinstance(config.get(namespace), dict):
+            value = merge_dicts(config[namespace], value)
+        config[namespace] = value
+    return config
+
+
+def list_namespaces(sources: dict) -> set[str]:
+    # namespaces of the directories next to the locale files a configuration was loaded from
+    namespaces = set()
+    for path in list(sources):
+        if not path.endswith('.yaml'):
+            continue
+        locale_dir = path[:-len('.yaml')]
+        if sources.get(locale_dir, _MISSING) is not _MISSING or not os.path.isdir(locale_dir):
+            continue
+        sources[locale_dir] = get_mtime(locale_dir)  # files added or removed
+        namespaces.update(name[:-len('.yaml')] for name in os.listdir(locale_dir) if name.endswith('.yaml'))
+    return namespaces
 
 
 # def _load_multiple(yaml_path: str) -> Optional[List[dict]]:
@@ -87,36 +329,124 @@ def _load_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR):
 
 
 def merge_dicts(base: dict, override: dict) -> dict:
+    # copy-on-write: base and override are left untouched, subtrees that are not merged are shared
+    merged = dict(base)
     for key, value in override.items():
-        if isinstance(value, dict) and isinstance(base.get(key), dict):
-            base[key] = merge_dicts(base[key], value)
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_dicts(merged[key], value)
         else:
-            base[key] = value
-    return base
+            merged[key] = value
+    return merged
+
+
+def list_locale_ids(locales_dir: str = DEFAULT_CONFIG_DIR) -> list[str]:
+    # locale files and namespace sharded locale directories, hidden entries (e.g. .bundles) excluded
+    return sorted({name[:-len('.yaml')] if name.endswith('.yaml') else name
+                   for name in os.listdir(locales_dir)
+                   if not name.startswith('.') and
+                   (name.endswith('.yaml') or os.path.isdir(os.path.join(locales_dir, name)))})
+
+
+def _get_header() -> dict:
+    # settings bundles and catalogs are built with, they are rebuilt when loaded with different ones. The locales
+    # directory is not part of them: source paths are relative to it, so that compiled directories can be moved.
+    return dict(default_locale=default_locale_id)
+
+
+def compile_locale_bundle(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR, bundle_dir: Optional[str] = None,
+                          flat_index: bool = False, errors: Optional[list] = None) -> str:
+    # Loads a locale from its yaml files with every namespace, parses all of its strings (see
+    # ConfigDict.build_templates) and writes its bundle, loaded by load_locale_config with the same bundle_dir.
+    # Returns the path of the bundle.
+    config = load_locale_config(locale, locales_dir=locales_dir, flat_index=flat_index)
+    config.build_templates(errors)
+    bundle_path = get_bundle_path(bundle_dir or os.path.join(locales_dir, '.bundles'), locale)
+    if not write_bundle(bundle_path, config.sources, _get_header(), base_dir=locales_dir, config=config.config,
+                        index=config.index, templates=config.templates):
+        raise OSError(f"Cannot write bundle {bundle_path}")
+    return bundle_path
 
 
 def load_locale_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR,
-                       fallback_locale: Optional[str] = None) -> ConfigDict:
+                       fallback_locale: Optional[str] = None, flat_index: bool = False,
+                       bundle_dir: Optional[str] = None,
+                       catalog_dir: Optional[str] = None,
+                       warm_templates: bool = False,
+                       check_sources: bool = True) -> Union[ConfigDict, MappedCatalog]:
+    # warm_templates parses every string of the locale at load time (see ConfigDict.build_templates), loading all of
+    # its namespaces. Catalogs are served without templates. check_sources=False uses existing bundles and catalogs
+    # without checking the modification times of their yaml files; locales loaded from them are not hot reloaded.
+    header = _get_header()
+    if catalog_dir:
+        catalog_path = get_catalog_path(catalog_dir, locale, fallback_locale)
+        catalog = open_catalog(catalog_path, base_dir=locales_dir, check_sources=check_sources, **header)
+        if catalog is not None:
+            if not check_sources:
+                catalog.sources = dict()
+            return catalog
+
+    config = None
+    if bundle_dir:
+        bundle_path = get_bundle_path(bundle_dir, locale, fallback_locale)
+        bundle = read_bundle(bundle_path, base_dir=locales_dir, check_sources=check_sources, **header)
+        if bundle is not None:
+            config = ConfigDict(bundle['config'], index=bundle['index'],
+                                sources=bundle['sources'] if check_sources else None, templates=bundle['templates'])
+
+    if config is None:
+        sources = dict()
+        config = _load_locale_config(locale, locales_dir, fallback_locale, sources=sources)
+
+        def load_namespace(namespace):
+            namespace_sources = dict()
+            namespace_config = _load_locale_config(locale, locales_dir, fallback_locale, sources=namespace_sources,
+                                                   namespaces=(namespace,))
+            return namespace_config.get(namespace), namespace_sources
+
+        config = ConfigDict(config, sources=sources, namespaces=list_namespaces(sources),
+                            namespace_loader=load_namespace)
+        if flat_index:
+            config.build_index()
+        if warm_templates:
+            config.build_templates()
+        if bundle_dir:
+            # bundles hold whole locales
+            config.load_namespaces()
+            write_bundle(bundle_path, sources, header, base_dir=locales_dir, config=config.config,
+                         index=config.index, templates=config.templates)
+    else:
+        if flat_index and config.index is None:
+            config.build_index()
+        if warm_templates and config.templates is None:
+            config.build_templates()
+
+    if catalog_dir and write_catalog(catalog_path, config, header=header, base_dir=locales_dir):
+        return open_catalog(catalog_path, base_dir=locales_dir, **header) or config
+    return config
+
+
+def _load_locale_config(locale: str, locales_dir: str, fallback_locale: Optional[str], sources: dict,
+                        namespaces: Optional[tuple] = None) -> dict:
     lang, _, country = locale.partition('_')
     # Load locale configurations
 
-    locale_config = _load_config(locale, locales_dir=locales_dir)
+    locale_config = _load_config(locale, locales_dir=locales_dir, sources=sources, namespaces=namespaces)
 
     if locale_config is None:
         if fallback_locale:
-            return load_locale_config(fallback_locale, locales_dir=locales_dir)
+            return _load_locale_config(fallback_locale, locales_dir, None, sources, namespaces)
         if locale != lang:
-            return load_locale_config(lang, locales_dir=locales_dir)
+            return _load_locale_config(lang, locales_dir, None, sources, namespaces)
         if locale != default_locale_id:
-            return load_locale_config(lang, locales_dir=locales_dir)
+            return _load_locale_config(lang, locales_dir, None, sources, namespaces)
         locale_config = dict()
 
     # default inheritance
     if not locale_config.get('$extends'):
         if locale != lang:
-            locale_config['$extends'] = lang
+            locale_config = dict(locale_config, **{'$extends': lang})
         elif locale != default_locale_id:
-            locale_config['$extends'] = default_locale_id
+            locale_config = dict(locale_config, **{'$extends': default_locale_id})
 
     # # Load default configurations
     # default_path = os.path.join(locales_dir, 'defaults.yaml')
@@ -131,9 +461,7 @@ def load_locale_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR,
     # locale_config = merge_dicts(resolved_defaults, locale_config)
 
     # Resolve inheritance
-    locale_config = resolve_inheritance(locale_config, locales_dir)
-
-    return ConfigDict(locale_config)
+    return resolve_inheritance(locale_config, locales_dir, sources=sources, namespaces=namespaces)
 
 
 # def eval_condition(condition: Union[str, List[str]], locale: str, lang: str) -> bool:
@@ -142,19 +470,31 @@ def load_locale_config(locale: str, locales_dir: str = DEFAULT_CONFIG_DIR,
 #     return locale in condition or lang in condition
 
 
-def resolve_inheritance(config: dict, locales_dir: str, path=()) -> dict:
+def resolve_inheritance(config: dict, locales_dir: str, path=(), sources: Optional[dict] = None,
+                        namespaces: Optional[tuple] = None) -> dict:
+    # config is not mutated, a copy is made when anything below it is resolved
+    resolved = config
     for key, value in config.items():
         if isinstance(value, dict):
             sub_path = path + (key,)
-            config[key] = resolve_inheritance(value, locales_dir=locales_dir, path=sub_path)
-
-    if '$extends' in config:
-        parent_locale = config.pop('$extends')
-        parent_config = _load_config(parent_locale, locales_dir=locales_dir) or {}
+            resolved_value = resolve_inheritance(value, locales_dir=locales_dir, path=sub_path, sources=sources,
+                                                 namespaces=namespaces)
+            if resolved_value is not value:
+                if resolved is config:
+                    resolved = dict(config)
+                resolved[key] = resolved_value
+
+    if '$extends' in resolved:
+        resolved = dict(resolved)
+        parent_locale = resolved.pop('$extends')
+        parent_config = _load_config(parent_locale, locales_dir=locales_dir, sources=sources,
+                                     namespaces=namespaces) or {}
         sub_parent_config = resolve_dict_path(parent_config, path)
-        config = merge_dicts(sub_parent_config, config)
+        # the parent is overlaid, not copied
+        if sub_parent_config and isinstance(sub_parent_config, _DICT_TYPES):
+            resolved = OverlayDict((resolved, sub_parent_config))
 
-    return config
+    return resolved
 
 
 def resolve_dict_path(obj, path):
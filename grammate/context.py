@@ -0,0 +1,81 @@
+__all__ = ['ContextLocale', 'use_locale', 'get_bound_locale']
+
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Optional, Union
+
+from .model import BaseLocale, ProxyLocale
+
+# locale bound by use_locale() in the current context: thread, asyncio task, or copied context
+_bound_locale: ContextVar[Optional['BaseLocale']] = ContextVar('grammate_locale', default=None)
+# tokens of the bindings entered in the current context, innermost last: a binding object may be entered by several
+# threads or tasks at once
+_binding_tokens: ContextVar[tuple] = ContextVar('grammate_binding_tokens', default=())
+
+
+def get_bound_locale() -> Optional['BaseLocale']:
+    return _bound_locale.get()
+
+
+def _resolve_locale(locale: Union['BaseLocale', str, None]) -> 'BaseLocale':
+    if isinstance(locale, BaseLocale):
+        return locale
+    from .config import default_locale_id
+    from .globals import get_locale
+    return get_locale(locale or default_locale_id)
+
+
+class ContextLocale(ProxyLocale):
+    # Resolves to the locale bound by use_locale() in the current context, or to default_locale when none is bound
+    def __init__(self, default_locale: Union['BaseLocale', str, None] = None):
+        self.default_locale = default_locale
+
+    def get_locale(self) -> 'BaseLocale':
+        locale = _bound_locale.get()
+        if locale is None:
+            locale = _resolve_locale(self.default_locale)
+        return locale
+
+
+class LocaleBinding:
+    def __init__(self, locale: Union['BaseLocale', str, None]):
+        self.locale = locale
+
+    def __enter__(self) -> 'BaseLocale':
+        locale = _resolve_locale(self.locale)
+        _binding_tokens.set(_binding_tokens.get() + (_bound_locale.set(locale),))
+        return locale
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        tokens = _binding_tokens.get()
+        _binding_tokens.set(tokens[:-1])
+        _bound_locale.reset(tokens[-1])
+
+    def __call__(self, func):
+        # the locale is bound for each call, in the caller's context, so that concurrent calls do not share tokens
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token = _bound_locale.set(_resolve_locale(self.locale))
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _bound_locale.reset(token)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _bound_locale.set(_resolve_locale(self.locale))
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _bound_locale.reset(token)
+
+        return wrapper
+
+
+def use_locale(locale: Union['BaseLocale', str, None] = None) -> LocaleBinding:
+    # binds a locale (resolved once) for a block or a function call, used by module level helpers and ContextLocale
+    return LocaleBinding(locale)
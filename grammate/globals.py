@@ -1,34 +1,223 @@
-from typing import Union
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Union, Optional, Iterable
 
+from .context import _bound_locale
 from .model import Locale, BaseLocale
 
 _locales: dict[str, 'Locale'] = dict()
+# locale id -> fallback locale id requested when it was loaded, to load it again the same way
+_fallback_locale_ids: dict[str, Optional[str]] = dict()
+# locale id -> future of the loads in progress, so that each locale is loaded by a single thread
+_loading: dict[str, 'Future'] = dict()
+# locale id -> thread loading it, and thread -> locale id whose load it waits on: threads waiting on each other are
+# detected
+_loading_threads: dict[str, int] = dict()
+_waiting_threads: dict[int, str] = dict()
+_loading_lock = threading.Lock()
 
 
 def get_locale(locale_id: str = '', fallback_locale_id: str = None) -> 'Locale':
-    global _locales
+    # the current locale is the one bound by use_locale(), if any, else the one set up by setup_locale()
+    if not locale_id:
+        locale = _bound_locale.get()
+        if locale is not None:
+            return locale
+
+    # lock-free once loaded
+    locale = _locales.get(locale_id)
+    if locale is not None:
+        return locale
+
+    from .setup import get_setup_config
+    return _load_once(locale_id, fallback_locale_id, get_setup_config())
+
+
+def _load_once(locale_id: str, fallback_locale_id: Optional[str], setup_config: dict) -> 'Locale':
+    # a circular fallback chain would make the threads loading its locales wait on each other forever: it is rejected
+    # before waiting on any load
+    _check_fallback_chain(locale_id, fallback_locale_id, setup_config['default_locale'])
+    thread_id = threading.get_ident()
+    with _loading_lock:
+        locale = _locales.get(locale_id)
+        if locale is not None:
+            return locale
+        future = _loading.get(locale_id)
+        loading = future is not None
+        if loading:
+            # loads requested with different fallbacks (e.g. fr -> ur and ur -> fr) can still end up waiting on each
+            # other from two threads
+            _check_waiting_threads(locale_id, thread_id)
+            _waiting_threads[thread_id] = locale_id
+        else:
+            future = _loading[locale_id] = Future()
+            _loading_threads[locale_id] = thread_id
+
+    if loading:
+        try:
+            return future.result()
+        finally:
+            with _loading_lock:
+                del _waiting_threads[thread_id]
+
+    try:
+        locale = _load_locale(locale_id, fallback_locale_id, setup_config)
+    except BaseException as e:
+        future.set_exception(e)
+        with _loading_lock:
+            del _loading[locale_id]
+            del _loading_threads[locale_id]
+        raise
+
+    with _loading_lock:
+        _locales[locale_id] = locale
+        del _loading[locale_id]
+        del _loading_threads[locale_id]
+    future.set_result(locale)
+    return locale
+
+
+def _check_waiting_threads(locale_id: str, thread_id: int):
+    # follows the threads loading the locale, the locale they wait on and so on: called with _loading_lock held
+    waited_id = locale_id
+    while waited_id is not None:
+        loading_thread_id = _loading_threads.get(waited_id)
+        if loading_thread_id == thread_id:
+            raise RuntimeError(f"Circular wait while loading locale {locale_id!r}: it is loaded by a thread waiting "
+                               f"on a load of this thread")
+        waited_id = _waiting_threads.get(loading_thread_id)
+
+
+def _check_fallback_chain(locale_id: str, fallback_locale_id: Optional[str], default_locale: str):
+    chain = [locale_id]
+    while True:
+        fallback_locale_id = _get_fallback_locale_id(chain[-1], fallback_locale_id, default_locale)
+        if not fallback_locale_id or fallback_locale_id in _locales:
+            return
+        if fallback_locale_id in chain:
+            raise RuntimeError(f"Circular fallback chain while loading locale {locale_id!r}: "
+                               f"{' -> '.join(chain + [fallback_locale_id])}")
+        chain.append(fallback_locale_id)
+        fallback_locale_id = None
+
+
+def _get_fallback_locale_id(locale_id: str, fallback_locale_id: Optional[str], default_locale: str) -> Optional[str]:
+    lang, _, country = locale_id.partition('_')
+
+    if fallback_locale_id is None and locale_id != lang:
+        fallback_locale_id = lang
+    elif fallback_locale_id is None and locale_id != default_locale:
+        fallback_locale_id = default_locale
+    return fallback_locale_id
+
+
+def _load_locale_config(locale_id: str, fallback_locale_id: Optional[str], setup_config: dict):
     from grammate.config import load_locale_config
+
+    _fallback_locale_ids[locale_id] = fallback_locale_id
+    return load_locale_config(locale_id,
+                              locales_dir=setup_config['locales_dir'],
+                              fallback_locale=fallback_locale_id,
+                              flat_index=setup_config['flat_index'],
+                              bundle_dir=setup_config['bundle_dir'],
+                              catalog_dir=setup_config['catalog_dir'],
+                              warm_templates=setup_config['warm_templates'],
+                              check_sources=setup_config['check_sources'])
+
+
+def _load_locale(locale_id: str, fallback_locale_id: Optional[str], setup_config: dict) -> 'Locale':
+    locale_config = _load_locale_config(locale_id, fallback_locale_id, setup_config)
+
+    fallback_locale_id = _get_fallback_locale_id(locale_id, fallback_locale_id, setup_config['default_locale'])
+    fallback_locale = get_locale(fallback_locale_id) if fallback_locale_id else None
+
+    return Locale(config=locale_config, fallback_locale=fallback_locale,
+                  template_cache_size=setup_config['template_cache_size'],
+                  compile_templates=setup_config['compile_templates'],
+                  missing_cache_size=setup_config['missing_cache_size'],
+                  lookup_cache_size=setup_config['lookup_cache_size'],
+                  pure_cache_size=setup_config['pure_cache_size'],
+                  max_expansion_depth=setup_config['max_expansion_depth'])
+
+
+def preload_locales(locale_ids: Optional[Iterable[str]] = None, max_workers: Optional[int] = None,
+                    use_processes: bool = False) -> dict[str, float]:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    from grammate.config import parse_locale_file, store_parsed_file, list_locale_ids
     from .setup import get_setup_config
 
     setup_config = get_setup_config()
-    default_locale = setup_config['default_locale']
+    locales_dir = setup_config['locales_dir']
+    if locale_ids is None:
+        locale_ids = list_locale_ids(locales_dir)
+
+    # dependency order: each locale comes after its fallback chain
+    ordered, seen = list(), set()
+
+    def visit(visited_id):
+        if visited_id in seen or visited_id in _locales:
+            return
+        seen.add(visited_id)
+        fallback_id = _get_fallback_locale_id(visited_id, None, setup_config['default_locale'])
+        if fallback_id:
+            visit(fallback_id)
+        ordered.append(visited_id)
+
+    for locale_id in locale_ids:
+        visit(locale_id)
+
+    # parse the yaml files concurrently into the parse cache, each one once. $extends parents that are not preloaded
+    # themselves are parsed on first use by the loads below. Bundles and catalogs make parsing unnecessary unless
+    # they are stale.
+    timings = dict.fromkeys(ordered, 0.0)
+    if not setup_config['bundle_dir'] and not setup_config['catalog_dir']:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=max_workers) as executor:
+            paths = {locale_id: os.path.join(locales_dir, f'{locale_id}.yaml') for locale_id in ordered}
+            futures = {locale_id: executor.submit(parse_locale_file, path) for locale_id, path in paths.items()}
+            for locale_id, future in futures.items():
+                content_hash, parsed, timings[locale_id] = future.result()
+                if content_hash is not None:
+                    store_parsed_file(paths[locale_id], content_hash, parsed)
+
+    # resolve inheritance and register the locales, fallbacks first
+    for locale_id in ordered:
+        start = time.perf_counter()
+        _load_once(locale_id, None, setup_config)
+        timings[locale_id] += time.perf_counter() - start
+
+    return timings
+
+
+def reload_locale(locale_id: str):
+    from .setup import get_setup_config
+
+    # the Locale object is kept (with its registered modifiers and formatters), only its configuration is swapped
+    locale = _locales[locale_id]
+    locale.reload(_load_locale_config(locale_id, _fallback_locale_ids.get(locale_id), get_setup_config()))
+    return locale
 
-    if locale_id not in _locales:
-        locale_config = load_locale_config(locale_id,
-                                           locales_dir=setup_config['locales_dir'],
-                                           fallback_locale=fallback_locale_id)
-        lang, _, country = locale_id.partition('_')
 
-        if fallback_locale_id is None and locale_id != lang:
-            fallback_locale_id = lang
-        elif fallback_locale_id is None and locale_id != default_locale:
-            fallback_locale_id = default_locale
+def get_changed_locale_ids() -> list[str]:
+    from grammate.bundle import get_mtime
 
-        fallback_locale = get_locale(fallback_locale_id) if fallback_locale_id else None
+    changed = list()
+    for locale_id, locale in list(_locales.items()):
+        sources = getattr(getattr(locale, 'config', None), 'sources', None)
+        if locale_id in _fallback_locale_ids and sources and \
+                any(get_mtime(path) != mtime for path, mtime in sources.items()):
+            changed.append(locale_id)
+    return changed
 
-        _locales[locale_id] = Locale(config=locale_config, fallback_locale=fallback_locale)
 
-    return _locales[locale_id]
+def reload_changed_locales() -> list[str]:
+    # reloads the locales built from yaml files (including $extends parents) that changed since they were loaded
+    changed = get_changed_locale_ids()
+    for locale_id in changed:
+        reload_locale(locale_id)
+    return changed
 
 
 def get_default_locale():
@@ -76,35 +265,51 @@ def get_text(text_key, locale='', **kwargs):
     return get_locale(locale).get_text(text_key, **kwargs)
 
 
-def register_modifier(modifier_id, modifier_func, locale=None):
+def render_many(items, locale=''):
+    return get_locale(locale).render_many(items)
+
+
+def iter_text(text_key, locale='', **kwargs):
+    return get_locale(locale).iter_text(text_key, **kwargs)
+
+
+def render_to(writer, text_key, locale='', **kwargs):
+    return get_locale(locale).render_to(writer, text_key, **kwargs)
+
+
+def render_columns(text_key, columns, lazy=False, locale=''):
+    return get_locale(locale).render_columns(text_key, columns, lazy=lazy)
+
+
+def register_modifier(modifier_id, modifier_func, locale=None, pure=False):
     if locale is None:
         from grammate.config import default_locale_id
         locale = default_locale_id
 
-    return get_locale(locale).register_modifier(modifier_id, modifier_func)
+    return get_locale(locale).register_modifier(modifier_id, modifier_func, pure=pure)
 
 
-def register_formatter(formatter_id, formatter_func, locale=None):
+def register_formatter(formatter_id, formatter_func, locale=None, pure=False):
     if locale is None:
         from grammate.config import default_locale_id
         locale = default_locale_id
 
-    return get_locale(locale).register_formatter(formatter_id, formatter_func)
+    return get_locale(locale).register_formatter(formatter_id, formatter_func, pure=pure)
 
 
-def modifier(modifier_id, locale=None):
+def modifier(modifier_id, locale=None, pure=False):
     def decorator(modifier_func):
-        register_modifier(modifier_id, modifier_func, locale=locale)
+        register_modifier(modifier_id, modifier_func, locale=locale, pure=pure)
         return modifier_func
 
     return decorator
 
 
-def formatter(cls, locale=None):
+def formatter(cls, locale=None, pure=False):
     formatter_id = Locale.get_formatter_id(cls)
 
     def decorator(formatter_func):
-        register_formatter(formatter_id, formatter_func, locale=locale)
+        register_formatter(formatter_id, formatter_func, locale=locale, pure=pure)
         return formatter_func
 
     return decorator
@@ -0,0 +1,200 @@
+__all__ = ['Instrumentation', 'instrument', 'uninstrument']
+
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional, Union
+from weakref import WeakSet
+
+from .model import BaseLocale, Locale, ProxyLocale
+from .parser import is_plain_text
+
+_LOCALE_METHODS = ('lookup', 'parse_template', 'compile_template', 'apply_modifier', 'format', 'get_text',
+                   'render_many', 'render_columns', 'iter_text')
+
+
+class Instrumentation:
+    # Counters collected from the instrumented locales. Instrumenting a locale shadows some of its methods with
+    # counting wrappers (instance attributes), so locales that are not instrumented pay nothing.
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None, track_keys: bool = True):
+        self.callback = callback
+        self.track_keys = track_keys
+        # held by the wrappers while updating the counters, and by snapshot while copying them
+        self._lock = threading.RLock()
+        self.locales = WeakSet()
+        self.counters = Counter()
+        # position in the fallback chain of the locale defining the looked up keys -> lookups
+        self.layers = Counter()
+        self.keys = Counter()
+        self.missing_keys = Counter()
+        # modifier or formatter id -> [calls, cumulative seconds]
+        self.modifiers = dict()
+        self.formatters = dict()
+
+    def reset(self):
+        # cleared in place, the wrappers of the instrumented locales hold references to the counters
+        with self._lock:
+            for counter in (self.counters, self.layers, self.keys, self.missing_keys, self.modifiers, self.formatters):
+                counter.clear()
+
+    def record_call(self, calls: dict, call_id: str, elapsed: float):
+        with self._lock:
+            stats = calls.get(call_id)
+            if stats is None:
+                stats = calls[call_id] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            snapshot = dict(
+                counters=dict(self.counters),
+                layers=dict(self.layers),
+                keys=dict(self.keys),
+                missing_keys=dict(self.missing_keys),
+                modifiers={key: dict(calls=calls, seconds=seconds) for key, (calls, seconds) in self.modifiers.items()},
+                formatters={key: dict(calls=calls, seconds=seconds)
+                            for key, (calls, seconds) in self.formatters.items()},
+            )
+            if reset:
+                self.reset()
+        return snapshot
+
+    def flush(self) -> dict:
+        # hands the counters collected since the last flush to the callback, e.g. to ship them to a metrics system
+        snapshot = self.snapshot(reset=True)
+        if self.callback:
+            self.callback(snapshot)
+        return snapshot
+
+
+def _instrument_locale(locale: 'Locale', instrumentation: 'Instrumentation'):
+    counters, lock, perf_counter = instrumentation.counters, instrumentation._lock, time.perf_counter
+    lookup, parse_template, compile_template, apply_modifier, format, get_text, render_many, render_columns, \
+        iter_text = (getattr(locale, name) for name in _LOCALE_METHODS)
+
+    def instrumented_lookup(key):
+        cache_hit = key in locale.lookup_cache
+        layer, value = lookup(key)
+        with lock:
+            counters['lookups'] += 1
+            if cache_hit:
+                counters['lookup_cache_hits'] += 1
+            if layer is None:
+                counters['misses'] += 1
+                if instrumentation.track_keys:
+                    instrumentation.missing_keys[key] += 1
+            else:
+                instrumentation.layers[layer] += 1
+            if instrumentation.track_keys:
+                instrumentation.keys[key] += 1
+        return layer, value
+
+    def count(name, n=1):
+        with lock:
+            counters[name] += n
+
+    def instrumented_parse_template(text):
+        if is_plain_text(text):
+            count('plain_texts')
+        elif text in (getattr(locale.config, 'templates', None) or ()):
+            count('prebuilt_template_hits')
+        elif text in locale.template_cache:
+            count('template_cache_hits')
+        else:
+            count('parses')
+        return parse_template(text)
+
+    def instrumented_compile_template(text):
+        count('compiled_cache_hits' if text in locale.compiled_cache else 'compiles')
+        return compile_template(text)
+
+    def instrumented_apply_modifier(modifier_id, *args):
+        start = perf_counter()
+        try:
+            return apply_modifier(modifier_id, *args)
+        finally:
+            instrumentation.record_call(instrumentation.modifiers, modifier_id, perf_counter() - start)
+
+    def instrumented_format(obj, fmt='', default_formatter=None, formatter_id=None):
+        start = perf_counter()
+        try:
+            return format(obj, fmt, default_formatter, formatter_id)
+        finally:
+            instrumentation.record_call(instrumentation.formatters,
+                                        formatter_id or locale.resolve_formatter_id(obj.__class__),
+                                        perf_counter() - start)
+
+    def instrumented_get_text(text_key, **kwargs):
+        count('renders')
+        return get_text(text_key, **kwargs)
+
+    def instrumented_render_many(items):
+        items = list(items)
+        count('renders', len(items))
+        return render_many(items)
+
+    def instrumented_render_columns(text_key, columns, lazy=False):
+        count('column_renders')
+        return render_columns(text_key, columns, lazy=lazy)
+
+    def instrumented_iter_text(text_key, **kwargs):
+        count('renders')
+        return iter_text(text_key, **kwargs)
+
+    for name, wrapper in zip(_LOCALE_METHODS, (
+            instrumented_lookup, instrumented_parse_template, instrumented_compile_template,
+            instrumented_apply_modifier, instrumented_format, instrumented_get_text, instrumented_render_many,
+            instrumented_render_columns, instrumented_iter_text)):
+        setattr(locale, name, wrapper)
+
+
+def _instrument_proxy(proxy: 'ProxyLocale', instrumentation: 'Instrumentation'):
+    get_locale = proxy.get_locale
+
+    def instrumented_get_locale():
+        with instrumentation._lock:
+            instrumentation.counters['proxy_resolutions'] += 1
+        locale = get_locale()
+        if getattr(locale, 'instrumentation', None) is None:
+            instrument(locale, instrumentation)
+        return locale
+
+    proxy.get_locale = instrumented_get_locale
+
+
+def instrument(locale: Union['BaseLocale', str] = '', instrumentation: Optional['Instrumentation'] = None) \
+        -> 'Instrumentation':
+    # instruments a locale (or the locales a proxy locale resolves to), returns the instrumentation collecting
+    # its counters. Locale ids are resolved with get_locale, '' being the current locale.
+    if isinstance(locale, str):
+        from .globals import get_locale
+        locale = get_locale(locale)
+    uninstrument(locale)
+
+    instrumentation = instrumentation or Instrumentation()
+    if isinstance(locale, ProxyLocale):
+        _instrument_proxy(locale, instrumentation)
+    elif isinstance(locale, Locale):
+        _instrument_locale(locale, instrumentation)
+    else:
+        raise TypeError(f"Cannot instrument {type(locale).__name__} objects")
+    locale.instrumentation = instrumentation
+    instrumentation.locales.add(locale)
+    return instrumentation
+
+
+def uninstrument(locale: Union['BaseLocale', str] = ''):
+    if isinstance(locale, str):
+        from .globals import get_locale
+        locale = get_locale(locale)
+    instrumentation = vars(locale).get('instrumentation')
+    for name in _LOCALE_METHODS + ('get_locale', 'instrumentation'):
+        vars(locale).pop(name, None)
+    if instrumentation is not None:
+        instrumentation.locales.discard(locale)
+        if isinstance(locale, ProxyLocale):
+            # the locales the proxy resolved to were instrumented with it
+            for resolved_locale in list(instrumentation.locales):
+                if not isinstance(resolved_locale, ProxyLocale):
+                    uninstrument(resolved_locale)
@@ -26,10 +26,26 @@ class BaseLocale(ABC):
     def get_text(self, text_key, **kwargs):
         pass
 
+    def render_many(self, items):
+        return [self.get_text(text_key, **(kwargs or {})) for text_key, kwargs in items]
+
+    def iter_text(self, text_key, **kwargs):
+        yield self.get_text(text_key, **kwargs)
+
+    def render_to(self, writer, text_key, **kwargs):
+        text = self.get_text(text_key, **kwargs)
+        getattr(writer, 'write', writer)(text)
+        return len(text)
+
+    def render_columns(self, text_key, columns, lazy=False):
+        kwargs_rows = [dict(zip(columns, row)) for row in zip(*columns.values())]
+        rendered = (self.get_text(text_key, **kwargs) for kwargs in kwargs_rows)
+        return rendered if lazy else list(rendered)
+
     @abstractmethod
-    def register_modifier(self, modifier_id, modifier_func):
+    def register_modifier(self, modifier_id, modifier_func, pure=False):
         pass
 
     @abstractmethod
-    def register_formatter(self, formatter_id, formatter_func):
+    def register_formatter(self, formatter_id, formatter_func, pure=False):
         pass
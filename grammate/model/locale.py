@@ -1,32 +1,136 @@
-from typing import Optional
+from typing import Optional, Callable, Iterable, Iterator, Union
+from weakref import WeakSet
 
 from .base import BaseLocale
+from ..cache import LRUCache
+from ..compiler import compile_template
 from ..config import ConfigDict
-from ..parser import ExpressionParser, BracketExpression, BraceExpression
+from ..parser import ExpressionParser, BracketExpression, BraceExpression, is_plain_text
+
+DEFAULT_TEMPLATE_CACHE_SIZE = 1024
+DEFAULT_MISSING_CACHE_SIZE = 4096
+DEFAULT_LOOKUP_CACHE_SIZE = 8192
+DEFAULT_PURE_CACHE_SIZE = 4096
+# how deep expression outputs containing expressions themselves are expanded
+MAX_EXPANSION_DEPTH = 64
+_NOT_FOUND = (None, None)
+_PLAIN = object()
+_MISSING = object()
+# formatted with their __format__ unless a formatter is registered for them
+_BUILTIN_SCALARS = (str, int, float, bool)
+
+
+def _as_text(value) -> str:
+    # configuration values and expression outputs are not all strings, e.g. `count: 0`
+    return value if isinstance(value, str) else str(value)
+
+
+def _format_str(obj, locale, fmt):
+    return str(obj)
+
+
+def _format_localized(obj, locale, fmt):
+    return obj.__localized_format__(locale, fmt)
+
+
+def _format_builtin(obj, locale, fmt):
+    return obj.__format__(fmt)
 
 
 class Locale(BaseLocale):
-    def __init__(self, config: 'ConfigDict', fallback_locale: Optional['Locale'] = None):
+    def __init__(self, config: 'ConfigDict', fallback_locale: Optional['Locale'] = None,
+                 template_cache_size: Optional[int] = DEFAULT_TEMPLATE_CACHE_SIZE, compile_templates: bool = False,
+                 missing_cache_size: Optional[int] = DEFAULT_MISSING_CACHE_SIZE,
+                 pure_cache_size: Optional[int] = DEFAULT_PURE_CACHE_SIZE,
+                 max_expansion_depth: int = MAX_EXPANSION_DEPTH,
+                 lookup_cache_size: Optional[int] = DEFAULT_LOOKUP_CACHE_SIZE):
         self.config = config
         self.modifiers = dict()
+        # ids of the modifiers and formatters registered as pure: same arguments, same result for a given locale
+        self.pure_modifiers = set()
+        self.pure_formatters = set()
         self.formatters = dict()
         self.fallback_locale = fallback_locale
+        self.compile_templates = compile_templates
+        self.max_expansion_depth = max_expansion_depth
+        self.template_cache = LRUCache(template_cache_size)
+        self.compiled_cache = LRUCache(template_cache_size)
+        # key -> (layer, value). Bounded: non-canonical spellings of a key (e.g. "list.01" and "list.001") resolve too
+        self.lookup_cache = LRUCache(lookup_cache_size)
+        self.missing_cache = LRUCache(missing_cache_size)
+        # type -> format handler and modifier_id -> modifier, resolved along the fallback chain
+        self.format_dispatch = dict()
+        self.modifier_cache = dict()
+        # modifier_id -> function applying it, memoized for pure modifiers
+        self.modifier_calls = dict()
+        # results of pure modifiers and formatters
+        self.pure_cache = LRUCache(pure_cache_size)
+        # incremented by each invalidation of the caches above, see _store
+        self.generation = 0
+        # locales falling back on this one, their lookups depend on ours
+        self.dependents = WeakSet()
+        if fallback_locale is not None:
+            fallback_locale.dependents.add(self)
 
     def get(self, key, default=None):
-        return self.config.get(key) or (self.fallback_locale.get(key, default) if self.fallback_locale else default)
+        layer, value = self.lookup(key)
+        return default if layer is None else value
+
+    def lookup(self, key) -> tuple[Optional[int], object]:
+        # returns the value of the key and the position in the fallback chain of the locale defining it,
+        # or (None, None) when no locale of the chain defines the key
+        found = self.lookup_cache.get(key)
+        if found is not None:
+            return found
+        if self.missing_cache.get(key):
+            return _NOT_FOUND
+
+        generation = self.generation
+        layer, locale = 0, self
+        while locale is not None:
+            value = locale.config.get(key)
+            if value is not None:
+                return self._store(self.lookup_cache, key, (layer, value), generation)
+            layer, locale = layer + 1, locale.fallback_locale
+
+        self._store(self.missing_cache, key, True, generation)
+        return _NOT_FOUND
+
+    def _store(self, cache: 'LRUCache', key, value, generation: int):
+        # Caches a value computed from the configuration of the given generation. A reload running meanwhile may have
+        # cleared the cache already: the value is dropped then, instead of outliving the configuration.
+        cache[key] = value
+        if self.generation != generation:
+            cache.pop(key, None)
+        return value
 
     def get_modifier(self, key, default=None):
-        return self.modifiers.get(key) or (
-            self.fallback_locale.get_modifier(key, default) if self.fallback_locale else default)
+        modifier = self.modifier_cache.get(key)
+        if modifier is None:
+            modifier = self.modifiers.get(key) or (
+                self.fallback_locale.get_modifier(key) if self.fallback_locale else None)
+            if not modifier:
+                return default
+            self.modifier_cache[key] = modifier
+        return modifier
 
     def get_formatter(self, key, default=None):
         return self.formatters.get(key) or (
             self.fallback_locale.get_formatter(key, default) if self.fallback_locale else default)
 
     def format(self, obj: object, fmt: str = '', default_formatter=None, formatter_id: str = None):
+        if not formatter_id and default_formatter is None:
+            cls = obj.__class__
+            handler = self.format_dispatch.get(cls)
+            if handler is None:
+                handler = self.format_dispatch[cls] = self._resolve_format_handler(cls)
+            return handler(obj, self, fmt)
+
         formatter_id = formatter_id or self.get_formatter_id(obj.__class__)
 
         formatter = self.get_formatter(formatter_id, default=default_formatter)
+        if formatter and formatter is not default_formatter and self.is_pure_formatter(formatter_id):
+            formatter = self._memoize_formatter(formatter_id, formatter)
 
         if obj is None:
             return str(obj)
@@ -38,43 +142,424 @@ class Locale(BaseLocale):
             return getattr(obj, '__format__')(fmt)
         return str(obj)
 
+    def resolve_formatter_id(self, cls) -> str:
+        # id of the formatter applied to cls objects: the first class of its mro with a registered formatter
+        for base in cls.__mro__:
+            formatter_id = self.get_formatter_id(base)
+            if self.get_formatter(formatter_id):
+                return formatter_id
+        return self.get_formatter_id(cls)
+
+    def _resolve_format_handler(self, cls):
+        if cls is type(None):
+            return _format_str
+        for base in cls.__mro__:
+            formatter_id = self.get_formatter_id(base)
+            formatter = self.get_formatter(formatter_id)
+            if formatter:
+                return self._memoize_formatter(formatter_id, formatter) if self.is_pure_formatter(formatter_id) \
+                    else formatter
+        if hasattr(cls, '__localized_format__'):
+            return _format_localized
+        if hasattr(cls, '__format__'):
+            return _format_builtin
+        return _format_str
+
     def apply_modifier(self, modifier_id, *args):
-        modifier = self.get_modifier(modifier_id)
-        if not modifier:
-            raise ValueError(f"Modifier {modifier_id=} not found!")
-        return modifier(self, *args)
+        call = self.modifier_calls.get(modifier_id)
+        if call is None:
+            modifier = self.get_modifier(modifier_id)
+            if not modifier:
+                raise ValueError(f"Modifier {modifier_id=} not found!")
+            call = self._memoize_modifier(modifier_id, modifier) if self.is_pure_modifier(modifier_id) else modifier
+            self.modifier_calls[modifier_id] = call
+        return call(self, *args)
+
+    def _memoize_modifier(self, modifier_id, modifier):
+        pure_cache = self.pure_cache
+
+        def memoized_modifier(locale, *args):
+            # types are part of the key: 1, 1.0 and True are equal but not rendered the same
+            key = ('!', modifier_id, args, tuple(arg.__class__ for arg in args))
+            try:
+                result = pure_cache.get(key, _MISSING)
+            except TypeError:  # unhashable arguments
+                return modifier(locale, *args)
+            if result is _MISSING:
+                generation = self.generation
+                result = self._store(pure_cache, key, modifier(locale, *args), generation)
+            return result
+
+        return memoized_modifier
+
+    def _memoize_formatter(self, formatter_id, formatter):
+        pure_cache = self.pure_cache
+
+        def memoized_formatter(obj, locale, fmt):
+            key = ('{', formatter_id, obj.__class__, obj, fmt)
+            try:
+                result = pure_cache.get(key, _MISSING)
+            except TypeError:
+                return formatter(obj, locale, fmt)
+            if result is _MISSING:
+                generation = self.generation
+                result = self._store(pure_cache, key, formatter(obj, locale, fmt), generation)
+            return result
+
+        return memoized_formatter
 
     def get_text(self, text_key, **kwargs):
-        text = self.get(text_key, default=text_key)
-        expression_parser = ExpressionParser()
-        resolved = False
-        while not resolved:
-            result, resolved = expression_parser.parse(text)
-            buffer = list()
-            for part in result:
-                if isinstance(part, BraceExpression):  # formatting
-                    buffer.append(self.format(kwargs.get(part.formatted_obj, None), part.format_spec))
-                elif isinstance(part, BracketExpression):
-                    buffer.append(self._process_bracket_expr(part, **kwargs))
-                else:
-                    buffer.append(part)
-
-                text = ''.join(buffer)
-
-        return text
-
-    def register_modifier(self, modifier_id, modifier_func):
+        return self._expand(self.get(text_key, default=text_key), kwargs, 0)
+
+    def _expand(self, text: str, kwargs: dict, depth: int = 0) -> str:
+        # Literal parts are emitted as parsed, only the expression outputs containing expressions themselves (chained
+        # modifiers) are expanded again: the whole text is never joined and parsed a second time.
+        text = _as_text(text)
+        if is_plain_text(text):
+            return text
+        if depth:  # expression output, see _parse_output
+            parts, resolved = self._parse_output(text)
+        elif self.compile_templates:
+            render, resolved = self.compile_template(text)
+            return render(self, kwargs, depth)
+        else:
+            parts, resolved = self.parse_template(text)
+        if resolved:  # static text, e.g. with escaped characters only
+            return ''.join(parts)
+        return self.render_parts(parts, kwargs, depth)
+
+    def _expand_output(self, text: str, kwargs: dict, depth: int) -> str:
+        text = _as_text(text)
+        if is_plain_text(text):
+            return text
+        if depth >= self.max_expansion_depth:
+            raise ValueError(f"Maximum expansion depth exceeded while rendering {text[:100]!r}")
+        return self._expand(text, kwargs, depth + 1)
+
+    def render_columns(self, text_key, columns: dict, lazy: bool = False) -> Union[list[str], Iterator[str]]:
+        # Renders text_key once per row of columns, a mapping of kwarg names to sequences of equal length (lists,
+        # tuples or numpy arrays). The template is parsed once, its constant parts are rendered once, and pure
+        # modifiers are applied once per distinct arguments.
+        columns = {name: values.tolist() if hasattr(values, 'tolist') else values for name, values in columns.items()}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        rows = self._iter_rows(_as_text(self.get(text_key, default=text_key)), columns,
+                               lengths.pop() if lengths else 0)
+        return rows if lazy else list(rows)
+
+    def _iter_rows(self, text: str, columns: dict, row_count: int) -> Iterator[str]:
+        parts, resolved = self.parse_template(text)
+        expand = self._expand_output
+
+        def row_kwargs(i):
+            return {name: values[i] for name, values in columns.items()}
+
+        def expanded(cell):
+            # expression outputs containing expressions themselves are expanded with the kwargs of their row
+            if not callable(cell):
+                text = _as_text(cell)
+                return text if is_plain_text(text) else lambda i: expand(text, row_kwargs(i), 0)
+
+            def expanded_cell(i):
+                text = _as_text(cell(i))
+                return text if is_plain_text(text) else expand(text, row_kwargs(i), 0)
+
+            return expanded_cell
+
+        # constant parts are merged into strings, the others become functions of the row index
+        cells = list()
+        for part in parts:
+            if isinstance(part, BraceExpression):
+                cell = expanded(self._get_format_cell(part, columns))
+            elif isinstance(part, BracketExpression):
+                cell = expanded(self._get_bracket_cell(part, columns))
+            else:
+                cell = part
+            if isinstance(cell, str) and cells and isinstance(cells[-1], str):
+                cells[-1] += cell
+            else:
+                cells.append(cell)
+
+        if len(cells) == 1 and isinstance(cells[0], str):
+            text = cells[0]
+            yield from (text for _ in range(row_count))
+            return
+
+        for i in range(row_count):
+            yield ''.join([cell if isinstance(cell, str) else cell(i) for cell in cells])
+
+    def _get_format_cell(self, part: 'BraceExpression', columns: dict):
+        values = columns.get(part.formatted_obj)
+        if values is None:
+            return self.format(None, part.format_spec)
+        format_spec, format = part.format_spec, self.format
+        # values of the types formatted by pure formatters (or by str.format for builtin scalars) are formatted once
+        # per distinct value of the batch
+        batch_formatters, results = dict(), dict()
+
+        def cell(i):
+            value = values[i]
+            cls = value.__class__
+            formatter = batch_formatters.get(cls, _MISSING)
+            if formatter is _MISSING:
+                formatter = batch_formatters[cls] = self._get_batch_formatter(cls)
+            if formatter is None:
+                return format(value, format_spec)
+            key = (cls, value)
+            try:
+                result = results.get(key, _MISSING)
+            except TypeError:  # unhashable values
+                return format(value, format_spec)
+            if result is _MISSING:
+                result = results[key] = formatter(value, self, format_spec)
+            return result
+
+        return cell
+
+    def _get_batch_formatter(self, cls):
+        formatter_id = self.resolve_formatter_id(cls)
+        formatter = self.get_formatter(formatter_id)
+        if formatter:
+            return formatter if self.is_pure_formatter(formatter_id) else None
+        return _format_builtin if cls in _BUILTIN_SCALARS else None
+
+    def _get_bracket_cell(self, part: 'BracketExpression', columns: dict):
+        if part.special == '!':
+            variables = [isinstance(arg, str) and arg[:1] == '$' for arg in part.args or []]
+            args = [columns.get(arg[1:]) if variable else arg for arg, variable in zip(part.args or [], variables)]
+            column_args = [j for j, variable in enumerate(variables) if variable and args[j] is not None]
+            pure = self.is_pure_modifier(part.stem)
+            if not column_args:
+                if pure:
+                    return self.apply_modifier(part.stem, *args)
+                return lambda i: self.apply_modifier(part.stem, *args)
+
+            def get_row_args(i):
+                row_args = list(args)
+                for j in column_args:
+                    row_args[j] = args[j][i]
+                return row_args
+
+            modifier = self.get_modifier(part.stem) if pure else None
+            if not modifier:
+                return lambda i: self.apply_modifier(part.stem, *get_row_args(i))
+            return self._memoize_cell(lambda i: modifier(self, *get_row_args(i)),
+                                      lambda i: self.apply_modifier(part.stem, *get_row_args(i)),
+                                      lambda i: tuple(args[j][i] for j in column_args))
+
+        values = columns.get(part.stem) if part.special == '$' else None
+        if values is None:
+            return self._process_bracket_expr(part)
+        get = self.get
+        return lambda i: get(values[i], values[i])
+
+    @staticmethod
+    def _memoize_cell(compute, compute_unhashable, get_key):
+        # Pure modifiers are applied once per distinct column arguments of the batch, kept for the batch only: a batch
+        # can have many more distinct arguments than the pure cache holds, it is left to get_text. Types are part of
+        # the key, 1, 1.0 and True are equal but not rendered the same.
+        results = dict()
+
+        def memoized_cell(i):
+            values = get_key(i)
+            key = (values, tuple(value.__class__ for value in values))
+            try:
+                result = results.get(key, _MISSING)
+            except TypeError:  # unhashable arguments
+                return compute_unhashable(i)
+            if result is _MISSING:
+                result = results[key] = compute(i)
+            return result
+
+        return memoized_cell
+
+    def iter_text(self, text_key, **kwargs) -> Iterator[str]:
+        # yields the rendered text of get_text in fragments instead of building it whole
+        return self._iter_fragments(self.get(text_key, default=text_key), kwargs, 0)
+
+    def _iter_fragments(self, text: str, kwargs: dict, depth: int) -> Iterator[str]:
+        text = _as_text(text)
+        if is_plain_text(text):
+            if text:
+                yield text
+            return
+
+        parts, resolved = self.parse_template(text) if depth == 0 else self._parse_output(text)
+        for part in parts:
+            if isinstance(part, BraceExpression):
+                yield from self._iter_output(self.format(kwargs.get(part.formatted_obj, None), part.format_spec),
+                                             kwargs, depth)
+            elif isinstance(part, BracketExpression):
+                yield from self._iter_output(self._process_bracket_expr(part, **kwargs), kwargs, depth)
+            elif part:
+                yield part
+
+    def _iter_output(self, text: str, kwargs: dict, depth: int) -> Iterator[str]:
+        # same depth limit as _expand_output
+        text = _as_text(text)
+        if is_plain_text(text):
+            if text:
+                yield text
+            return
+        if depth >= self.max_expansion_depth:
+            raise ValueError(f"Maximum expansion depth exceeded while rendering {text[:100]!r}")
+        yield from self._iter_fragments(text, kwargs, depth + 1)
+
+    def render_to(self, writer, text_key, **kwargs) -> int:
+        # writes the rendered text fragment by fragment to a file-like object (or a callable), returns its length
+        write = getattr(writer, 'write', writer)
+        length = 0
+        for fragment in self.iter_text(text_key, **kwargs):
+            write(fragment)
+            length += len(fragment)
+        return length
+
+    def render_parts(self, parts: tuple, kwargs: dict, depth: int = 0) -> str:
+        buffer = list()
+        expand = self._expand_output
+        for part in parts:
+            if isinstance(part, BraceExpression):  # formatting
+                text = self.format(kwargs.get(part.formatted_obj, None), part.format_spec)
+                buffer.append(expand(text, kwargs, depth))
+            elif isinstance(part, BracketExpression):
+                buffer.append(expand(self._process_bracket_expr(part, **kwargs), kwargs, depth))
+            else:
+                buffer.append(part)
+        return ''.join(buffer)
+
+    def render_many(self, items: Iterable[tuple[str, Optional[dict]]]) -> list[str]:
+        # renders (text_key, kwargs) pairs in order, like get_text, looking up each key and each template once
+        # for the whole batch
+        compiled = self.compile_templates
+        get_template = self.compile_template if compiled else self.parse_template
+        render_parts = self.render_parts
+        texts, templates, results = dict(), dict(), list()
+        for text_key, kwargs in items:
+            if kwargs is None:
+                kwargs = dict()
+            text = texts.get(text_key)
+            if text is None:
+                text = texts[text_key] = _as_text(self.get(text_key, default=text_key))
+            template = templates.get(text)
+            if template is None:
+                template = templates[text] = _PLAIN if is_plain_text(text) else get_template(text)[0]
+            if template is not _PLAIN:
+                text = template(self, kwargs, 0) if compiled else render_parts(template, kwargs, 0)
+            results.append(text)
+        return results
+
+    def parse_template(self, text: str) -> tuple[tuple, bool]:
+        if is_plain_text(text):
+            return (text,), True
+
+        # templates parsed at load time are used as is, whatever the size of the template cache
+        templates = getattr(self.config, 'templates', None)  # plain mappings can be configurations too
+        if templates:
+            template = templates.get(text)
+            if template is not None:
+                return template
+
+        template = self.template_cache.get(text)
+        if template is None:
+            template = self._get_prebuilt_template(text)
+            if template is None:
+                result, resolved = ExpressionParser().parse(text)
+                template = tuple(result), resolved
+            self.template_cache[text] = template
+        return template
+
+    def _parse_output(self, text: str) -> tuple[tuple, bool]:
+        # Expression outputs (modifier and formatter results, kwargs) are parsed without filling the template cache:
+        # they are unbounded, and would evict the templates of the configuration and keep large outputs alive.
+        template = self.template_cache.get(text)
+        if template is None:
+            template = self._get_prebuilt_template(text, include_self=True)
+        if template is None:
+            result, resolved = ExpressionParser().parse(text)
+            template = tuple(result), resolved
+        return template
+
+    def _get_prebuilt_template(self, text: str, include_self: bool = False) -> Optional[tuple[tuple, bool]]:
+        # templates parsed ahead of time by the fallback locales
+        locale = self if include_self else self.fallback_locale
+        while locale is not None:
+            templates = getattr(getattr(locale, 'config', None), 'templates', None)
+            if templates:
+                template = templates.get(text)
+                if template is not None:
+                    return template
+            locale = getattr(locale, 'fallback_locale', None)
+        return None
+
+    def compile_template(self, text: str) -> tuple[Callable[..., str], bool]:
+        template = self.compiled_cache.get(text)
+        if template is None:
+            result, resolved = self.parse_template(text)
+            template = compile_template(result), resolved
+            self.compiled_cache[text] = template
+        return template
+
+    def reload(self, config: 'ConfigDict'):
+        # parsed and compiled templates do not depend on the configuration, they are kept
+        self.config = config
+        self.invalidate_lookups()
+
+    def clear_cache(self):
+        self.template_cache.clear()
+        self.compiled_cache.clear()
+        self.invalidate_lookups()
+
+    def invalidate_lookups(self):
+        self.generation += 1
+        self.lookup_cache.clear()
+        self.missing_cache.clear()
+        # pure modifiers and formatters can depend on the configuration of the locale
+        self.pure_cache.clear()
+        for dependent in list(self.dependents):
+            dependent.invalidate_lookups()
+
+    def invalidate_dispatch(self):
+        self.generation += 1
+        self.format_dispatch.clear()
+        self.modifier_cache.clear()
+        self.modifier_calls.clear()
+        self.pure_cache.clear()
+        for dependent in list(self.dependents):
+            dependent.invalidate_dispatch()
+
+    def is_pure_modifier(self, modifier_id) -> bool:
+        if modifier_id in self.modifiers:
+            return modifier_id in self.pure_modifiers
+        return self.fallback_locale.is_pure_modifier(modifier_id) if self.fallback_locale else False
+
+    def register_modifier(self, modifier_id, modifier_func, pure: bool = False):
         self.modifiers[modifier_id] = modifier_func
+        if pure:
+            self.pure_modifiers.add(modifier_id)
+        else:
+            self.pure_modifiers.discard(modifier_id)
+        self.invalidate_dispatch()
 
-    def register_formatter(self, formatter_id, formatter_func):
+    def is_pure_formatter(self, formatter_id) -> bool:
+        if formatter_id in self.formatters:
+            return formatter_id in self.pure_formatters
+        return self.fallback_locale.is_pure_formatter(formatter_id) if self.fallback_locale else False
+
+    def register_formatter(self, formatter_id, formatter_func, pure: bool = False):
         self.formatters[formatter_id] = formatter_func
+        if pure:
+            self.pure_formatters.add(formatter_id)
+        else:
+            self.pure_formatters.discard(formatter_id)
+        self.invalidate_dispatch()
 
     def _process_bracket_expr(self, bracket_expr: 'BracketExpression', **kwargs) -> str:
         key = bracket_expr.stem
 
         if bracket_expr.special == '!':
             # modifier
-            resolved_args = [kwargs.get(arg[1:], None) if arg and arg[0] == '$' else arg for arg in
+            resolved_args = [kwargs.get(arg[1:], None) if isinstance(arg, str) and arg[:1] == '$' else arg for arg in
                              bracket_expr.args or []]
             return self.apply_modifier(key, *resolved_args)
         else:
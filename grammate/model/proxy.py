@@ -25,8 +25,20 @@ class ProxyLocale(BaseLocale, ABC):
     def get_text(self, text_key, **kwargs):
         return self.get_locale().get_text(text_key, **kwargs)
 
-    def register_modifier(self, modifier_id, modifier_func):
-        return self.get_locale().register_modifier(modifier_id, modifier_func)
+    def render_many(self, items):
+        return self.get_locale().render_many(items)
 
-    def register_formatter(self, formatter_id, formatter_func):
-        return self.get_locale().register_formatter(formatter_id, formatter_func)
+    def iter_text(self, text_key, **kwargs):
+        return self.get_locale().iter_text(text_key, **kwargs)
+
+    def render_to(self, writer, text_key, **kwargs):
+        return self.get_locale().render_to(writer, text_key, **kwargs)
+
+    def render_columns(self, text_key, columns, lazy=False):
+        return self.get_locale().render_columns(text_key, columns, lazy=lazy)
+
+    def register_modifier(self, modifier_id, modifier_func, pure=False):
+        return self.get_locale().register_modifier(modifier_id, modifier_func, pure=pure)
+
+    def register_formatter(self, formatter_id, formatter_func, pure=False):
+        return self.get_locale().register_formatter(formatter_id, formatter_func, pure=pure)
@@ -1,15 +1,35 @@
 __all__ = ['ExpressionParser', 'BraceExpression', 'BracketExpression']
 from typing import List, Union, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 import re
 import yaml
-from yaml.parser import ParserError as YAMLParserError
 
 BRACKET_PATTERN = re.compile(r'^\[(\$|!)?([a-z0-9_]+(?:\.[a-z0-9_]+)*)(?::(.+))?\]$', re.IGNORECASE)
 BRACE_PATTERN = re.compile(r'^{([a-z_][a-z0-9_]*?)(:[^\}]+)?}$', re.IGNORECASE)
-
-
-@dataclass
+STOP_CHARS = {
+    "TEXT": ('{', '[', '\\'),
+    "BRACE": ('}', '\\'),
+    "BRACKET": (']', '\\'),
+}
+ESCAPABLE_CHARS = ('\\', '{', '[', '}', ']')
+ARGUMENT_PATTERN = re.compile(r" *(?:'((?:[^'\n]|'')*)'|\"([^\"\\\\\n]*)\"|([\w$.+-]+(?: +[\w$.+-]+)*)) *(,|$)")
+INTEGER_PATTERN = re.compile(r'^[-+]?(?:0|[1-9][0-9]*)$')
+FLOAT_PATTERN = re.compile(r'^[-+]?[0-9]+\.[0-9]+$')
+# YAML 1.1 plain scalars resolved to something else than a string
+PLAIN_CONSTANTS = {
+    **dict.fromkeys(('null', 'Null', 'NULL'), None),
+    **dict.fromkeys(('true', 'True', 'TRUE', 'yes', 'Yes', 'YES', 'on', 'On', 'ON'), True),
+    **dict.fromkeys(('false', 'False', 'FALSE', 'no', 'No', 'NO', 'off', 'Off', 'OFF'), False),
+}
+
+
+def is_plain_text(text: str) -> bool:
+    # text without any of these characters always parses to itself
+    return '{' not in text and '[' not in text and '\\' not in text
+
+
+@dataclass(frozen=True)
 class BracketExpression:
     stem: str
     special: Optional[str] = None
@@ -22,20 +42,55 @@ class BracketExpression:
             args_string = match.group(3).strip() if match.group(3) else None
             args = None
             if args_string:
-                args = []
                 try:
-                    args = yaml.safe_load(f"[{args_string}]")
-                except YAMLParserError:
+                    args = parse_arguments(args_string)
+                except yaml.YAMLError:
                     # TODO: log warning
                     return expression
 
-            return BracketExpression(match.group(2), special=match.group(1) or None,
-                                     args=tuple(args) if args is not None else None)
+            return BracketExpression(match.group(2), special=match.group(1) or None, args=args)
 
         return expression
 
 
-@dataclass
+def _parse_plain_argument(value: str):
+    if value in PLAIN_CONSTANTS:
+        return PLAIN_CONSTANTS[value]
+    if INTEGER_PATTERN.match(value):
+        return int(value)
+    if FLOAT_PATTERN.match(value):
+        return float(value)
+    if value[0] in '0123456789+-.':  # octal, sexagesimal, timestamps...
+        raise ValueError(value)
+    return value
+
+
+@lru_cache(maxsize=1024)
+def parse_arguments(args_string: str) -> tuple:
+    # Fast path for the usual scalars, quoted strings and $var references,
+    # anything else is parsed as a YAML flow sequence.
+    args = []
+    position, length = 0, len(args_string)
+    try:
+        while position < length:
+            match = ARGUMENT_PATTERN.match(args_string, position)
+            if match is None or (match.group(4) and match.end() == length):
+                raise ValueError(args_string)
+            single_quoted, double_quoted, plain = match.group(1, 2, 3)
+            if single_quoted is not None:
+                args.append(single_quoted.replace("''", "'"))
+            elif double_quoted is not None:
+                args.append(double_quoted)
+            else:
+                args.append(_parse_plain_argument(plain))
+            position = match.end()
+    except ValueError:
+        args = yaml.safe_load(f"[{args_string}]")
+
+    return tuple(args)
+
+
+@dataclass(frozen=True)
 class BraceExpression:
     formatted_obj: str
     format_spec: str = ''
@@ -55,6 +110,8 @@ class ExpressionParser:
         self.result: List[Union[str, BracketExpression, BraceExpression]] = []
         self.buffer = []
         self.state = "TEXT"
+        # malformed expressions of the last parsed text, kept as literal text
+        self.errors: List[str] = []
 
     def pop_buffer(self):
         content = "".join(self.buffer)
@@ -69,59 +126,61 @@ class ExpressionParser:
         self.result: List[Union[str, BracketExpression, BraceExpression]] = []
         self.buffer = []
         self.state = "TEXT"
-        previous_state = self.state
-        it = iter(text)
+        self.errors = []
         resolved = True
-        for char in it:
-            if self.state == "TEXT":
-                if char == "{":
-                    self.flush_buffer()
-                    self.state = "BRACE"
-                    self.buffer.append(char)
-                elif char == "[":
-                    self.flush_buffer()
-                    self.state = "BRACKET"
-                    self.buffer.append(char)
-                elif char == '\\':
-                    previous_state = self.state
-                    self.state = 'ESCAPE'
-                else:
-                    self.buffer.append(char)
+        position, length = 0, len(text)
+        next_indexes = dict()
+        while position < length:
+            # jump over the literal run up to the next character meaningful in the current state
+            index = length
+            for stop_char in STOP_CHARS[self.state]:
+                next_index = next_indexes.get(stop_char, -1)
+                if next_index < position:
+                    next_index = text.find(stop_char, position)
+                    if next_index == -1:
+                        next_index = length
+                    next_indexes[stop_char] = next_index
+                if next_index < index:
+                    index = next_index
+
+            if index == length:
+                self.buffer.append(text[position:])
+                break
+
+            if index > position:
+                self.buffer.append(text[position:index])
+            char = text[index]
+            position = index + 1
+
+            if char == '\\':
+                if position == length:  # dangling escape
+                    break
+                char = text[position]
+                position += 1
+                if char not in ESCAPABLE_CHARS:
+                    self.buffer.append('\\')
+                self.buffer.append(char)
 
-            elif self.state == "BRACE":
-                if char == "}":  # Closing brace
-                    self.buffer.append(char)
-                    expression = self.pop_buffer()
+            elif self.state == "TEXT":  # opening brace or bracket
+                self.flush_buffer()
+                self.state = "BRACE" if char == "{" else "BRACKET"
+                self.buffer.append(char)
+
+            else:  # closing brace or bracket
+                self.buffer.append(char)
+                expression = self.pop_buffer()
+                if self.state == "BRACE":
                     content = BraceExpression.parse(expression)
-                    if isinstance(content, BraceExpression):
-                        resolved = False
-                    self.result.append(content)
-                    self.state = "TEXT"
-                elif char == '\\':
-                    previous_state = self.state
-                    self.state = 'ESCAPE'
                 else:
-                    self.buffer.append(char)
-
-            elif self.state == "BRACKET":
-                if char == "]":  # Closing bracket
-                    self.buffer.append(char)
-                    expression = self.pop_buffer()
                     content = BracketExpression.parse(expression)
-                    if isinstance(content, BracketExpression):
-                        resolved = False
-                    self.result.append(content)
-                    self.state = "TEXT"
-                elif char == '\\':
-                    previous_state = self.state
-                    self.state = 'ESCAPE'
+                if isinstance(content, str):
+                    self.errors.append(content)
                 else:
-                    self.buffer.append(char)
-            elif self.state == "ESCAPE":
-                if char not in ('\\', '{', '[', '}', ']'):
-                    self.buffer.append('\\')
-                self.buffer.append(char)
-                self.state = previous_state
+                    resolved = False
+                self.result.append(content)
+                self.state = "TEXT"
 
+        if self.state != "TEXT":  # unclosed expression
+            self.errors.append(''.join(self.buffer))
         self.flush_buffer()
         return self.result, resolved
@@ -6,6 +6,8 @@ _setup_config: Optional[dict] = None
 def setup(default_locale=None, locales_dir=None, **kwargs):
     from grammate.config import set_default_locale_id, DEFAULT_CONFIG_DIR
     from grammate.config import default_locale_id
+    from grammate.model.locale import DEFAULT_TEMPLATE_CACHE_SIZE, DEFAULT_MISSING_CACHE_SIZE, \
+        DEFAULT_PURE_CACHE_SIZE, DEFAULT_LOOKUP_CACHE_SIZE, MAX_EXPANSION_DEPTH
 
     if default_locale:
         set_default_locale_id(default_locale)
@@ -16,6 +18,17 @@ def setup(default_locale=None, locales_dir=None, **kwargs):
     config = dict(
         default_locale=default_locale,
         locales_dir=locales_dir or DEFAULT_CONFIG_DIR,
+        template_cache_size=DEFAULT_TEMPLATE_CACHE_SIZE,
+        compile_templates=False,
+        flat_index=False,
+        warm_templates=False,
+        bundle_dir=None,
+        catalog_dir=None,
+        check_sources=True,
+        missing_cache_size=DEFAULT_MISSING_CACHE_SIZE,
+        lookup_cache_size=DEFAULT_LOOKUP_CACHE_SIZE,
+        pure_cache_size=DEFAULT_PURE_CACHE_SIZE,
+        max_expansion_depth=MAX_EXPANSION_DEPTH,
     )
     config.update(kwargs)
 
@@ -0,0 +1,45 @@
+__all__ = ['LocaleWatcher', 'watch_locales']
+
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LocaleWatcher(threading.Thread):
+    # Polls the yaml files the loaded locales were built from, and reloads the locales whose files changed
+    def __init__(self, interval: float = 2.0, on_reload: Optional[Callable[[list], None]] = None):
+        super().__init__(name='grammate-locale-watcher', daemon=True)
+        self.interval = interval
+        self.on_reload = on_reload
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def check(self) -> list[str]:
+        from .globals import get_changed_locale_ids, reload_locale
+
+        reloaded = list()
+        for locale_id in get_changed_locale_ids():
+            try:
+                reload_locale(locale_id)
+            except Exception:  # e.g. a file saved halfway, the previous configuration is kept
+                logger.exception(f"Failed to reload locale {locale_id!r}")
+            else:
+                reloaded.append(locale_id)
+
+        if reloaded and self.on_reload:
+            self.on_reload(reloaded)
+        return reloaded
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def watch_locales(interval: float = 2.0, on_reload: Optional[Callable[[list], None]] = None) -> LocaleWatcher:
+    watcher = LocaleWatcher(interval=interval, on_reload=on_reload)
+    watcher.start()
+    return watcher
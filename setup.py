@@ -57,7 +57,10 @@ if __name__ == "__main__":
         url=URL,
         install_requires=load_requirements(),
         python_requires='>=3',
-        packages=['grammate'],
+        packages=['grammate', 'grammate.model'],
+        entry_points={
+            'console_scripts': ['grammate=grammate.cli:main'],
+        },
         package_data={
             '': ['LICENSE', 'requirements.txt', 'README.md'],
         },
@@ -1,11 +1,24 @@
+import os
+import shutil
 import sys
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from unittest import mock
 from grammate import (
     flatten_config,
     merge_dicts,
     load_locale_config,
+    OverlayDict,
+    ConfigDict,
 )
+from grammate.bundle import read_bundle, write_bundle
+from grammate.catalog import MappedCatalog, write_catalog
+from grammate.config import clear_parse_cache
+from grammate.cli import compile_locales, main
+from grammate.model import Locale
+import grammate.config
 
 TEST_LOCALES_DIR = "locales"
 
@@ -71,6 +84,250 @@ class TestLocalizationConfigs(unittest.TestCase):
         config = load_locale_config("es", locales_dir=TEST_LOCALES_DIR, fallback_locale="en")
         self.assertEqual(config["greeting"], "Hello")
 
+    def test_load_locale_config_flat_index(self):
+        for locale in ("ar", "ar_MA", "ur", "fr"):
+            config = load_locale_config(locale, locales_dir=TEST_LOCALES_DIR)
+            indexed = load_locale_config(locale, locales_dir=TEST_LOCALES_DIR, flat_index=True)
+            self.assertIsNotNone(indexed.index)
+            for key in list(indexed.index) + ["missing", "date.months.13", "date.months.05", "month.plural.01"]:
+                self.assertEqual(indexed[key], config[key])
+
+        indexed = load_locale_config("ar", locales_dir=TEST_LOCALES_DIR, flat_index=True)
+        self.assertEqual(indexed["date.months.5"], "مايو")
+        self.assertEqual(indexed["key.subkey1"], "flat_test")
+        self.assertEqual(indexed["month.plural.1"], "أشهر")
+
+    def test_load_locale_config_bundle(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            locales_dir = os.path.join(tmp_dir, "locales")
+            bundle_dir = os.path.join(tmp_dir, "bundles")
+            shutil.copytree(TEST_LOCALES_DIR, locales_dir)
+
+            config = load_locale_config("ar_MA", locales_dir=locales_dir, bundle_dir=bundle_dir)
+            bundle_path = os.path.join(bundle_dir, "ar_MA.bundle")
+            self.assertTrue(os.path.exists(bundle_path))
+            self.assertIn(os.path.abspath(os.path.join(locales_dir, "ar.yaml")), config.sources)
+
+            bundled = load_locale_config("ar_MA", locales_dir=locales_dir, bundle_dir=bundle_dir)
+            self.assertEqual(bundled.config, config.config)
+            self.assertEqual(bundled["farewell"], "الوداع")
+
+            # changing any source file invalidates the bundle
+            with open(os.path.join(locales_dir, "ar.yaml"), "a", encoding="utf-8") as f:
+                f.write("\nfarewell: مع السلامة\n")
+            os.utime(os.path.join(locales_dir, "ar.yaml"), ns=(0, 0))
+            self.assertEqual(load_locale_config("ar_MA", locales_dir=locales_dir, bundle_dir=bundle_dir)["farewell"],
+                             "مع السلامة")
+
+    def test_write_bundle_concurrently(self):
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            bundle_path = os.path.join(bundle_dir, "en.bundle")
+            configs = [{"key": str(i) * 10000} for i in range(16)]
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                written = list(executor.map(lambda config: write_bundle(bundle_path, {}, {}, config=config), configs))
+            self.assertTrue(all(written))
+            self.assertIn(read_bundle(bundle_path)["config"], configs)
+            self.assertEqual(os.listdir(bundle_dir), ["en.bundle"])
+
+    def test_load_locale_config_namespaces(self):
+        files = {
+            "en.yaml": "greeting: Hello\n",
+            "en/checkout.yaml": "pay: Pay\ncancel: Cancel\n",
+            "fr.yaml": "greeting: Bonjour\ndate:\n  format: '%B'\n",
+            "fr/date.yaml": "format: '%d %B'\nmonths:\n  1: Janvier\n",
+            "fr/checkout.yaml": "cancel: Annuler\n",
+            "fr_CA/checkout.yaml": "pay: Payer\n",
+            # namespaces can extend the same namespace of another locale
+            "fr_BE/checkout.yaml": "$extends: en\npay: Payer\n",
+        }
+        with tempfile.TemporaryDirectory() as locales_dir:
+            for name, content in files.items():
+                os.makedirs(os.path.dirname(os.path.join(locales_dir, name)), exist_ok=True)
+                with open(os.path.join(locales_dir, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+
+            config = load_locale_config("fr_CA", locales_dir=locales_dir)
+            self.assertEqual(config.pending_namespaces, {"checkout", "date"})
+            self.assertEqual(set(config), {"greeting", "date", "checkout"})
+            self.assertEqual(config["greeting"], "Bonjour")
+            self.assertNotIn("checkout", config.config)
+
+            # namespaces are loaded on first access, each one on its own
+            self.assertEqual(config["checkout.pay"], "Payer")
+            self.assertEqual(config["checkout.cancel"], "Annuler")
+            self.assertEqual(config.pending_namespaces, {"date"})
+            self.assertIn(os.path.abspath(os.path.join(locales_dir, "fr", "checkout.yaml")), config.sources)
+            self.assertEqual(config["date"], {"format": "%d %B", "months": {1: "Janvier"}})
+            self.assertEqual(config.pending_namespaces, set())
+
+            config = load_locale_config("fr_BE", locales_dir=locales_dir)
+            self.assertEqual(config["checkout"], {"pay": "Payer", "cancel": "Cancel"})
+
+            config = load_locale_config("fr_CA", locales_dir=locales_dir, flat_index=True)
+            self.assertEqual(config.index["date.months.1"], "Janvier")
+            self.assertEqual(config["checkout.pay"], "Payer")
+
+    def test_load_locale_config_overlays(self):
+        with tempfile.TemporaryDirectory() as locales_dir:
+            files = {
+                "en.yaml": "greeting: Hello\nfarewell: Goodbye\n"
+                           "nested:\n  greeting: Hello\n  farewell: Goodbye\n",
+                "ar.yaml": "greeting: مرحبا\nfarewell: الوداع\n"
+                           "date:\n  months:\n    1: يناير\n    2: فبراير\n",
+                "ar_XX.yaml": "greeting: أهلا\ndate:\n  months:\n    1: جانفي\n",
+                "ar_YY.yaml": "farewell: مع السلامة\nwelcome: أهلا\n"
+                              "nested:\n  $extends: en\n  greeting: Hi\n",
+            }
+            for name, content in files.items():
+                with open(os.path.join(locales_dir, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+
+            ar_xx = load_locale_config("ar_XX", locales_dir=locales_dir)
+            ar_yy = load_locale_config("ar_YY", locales_dir=locales_dir)
+            self.assertEqual(ar_xx["date.months"], {1: "جانفي", 2: "فبراير"})
+            self.assertEqual(ar_xx["farewell"], "الوداع")
+            self.assertEqual(ar_yy["nested"], {"greeting": "Hi", "farewell": "Goodbye"})
+            self.assertEqual(ar_yy["farewell"], "مع السلامة")
+
+            # variants only hold their own keys above the shared parsed tree of their parent
+            self.assertIsInstance(ar_xx.config, OverlayDict)
+            self.assertEqual(set(ar_xx.config.layers[0]), {"greeting", "date"})
+            self.assertIs(ar_xx.config.layers[1], ar_yy.config.layers[1])
+            # repeated strings are interned
+            self.assertIs(ar_xx["greeting"], ar_yy["welcome"])
+
+    def test_compile_locales(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            locales_dir = os.path.join(tmp_dir, "locales")
+            bundle_dir = os.path.join(locales_dir, ".bundles")
+            shutil.copytree(TEST_LOCALES_DIR, locales_dir)
+            with open(os.path.join(locales_dir, "fr.yaml"), "a", encoding="utf-8") as f:
+                f.write("\nbroken: 'Hello {name!} [missing'\ngreet: 'Hello {name}, [$key]'\n")
+
+            bundle_paths, malformed = compile_locales(locales_dir, bundle_dir)
+            self.assertEqual(list(bundle_paths), ["en", "ar", "ar_MA", "fr", "ur"])
+            self.assertEqual(malformed, [("fr", "broken", "{name!}"), ("fr", "broken", "[missing")])
+
+            # the compiled bundle is used, with the strings already parsed
+            config = load_locale_config("fr", locales_dir=locales_dir, bundle_dir=bundle_dir)
+            self.assertEqual(config.sources, load_locale_config("fr", locales_dir=locales_dir).sources)
+            template = config.templates["Hello {name}, [$key]"]
+            self.assertIs(Locale(config).parse_template("Hello {name}, [$key]"), template)
+            self.assertEqual(Locale(config).get_text("greet", name="Bob", key="no.key"), "Hello Bob, no.key")
+
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+                self.assertEqual(main(["compile", locales_dir, "-o", bundle_dir, "-l", "ar_MA", "-q"]), 0)
+                self.assertEqual(main(["compile", locales_dir, "-o", bundle_dir]), 1)
+                self.assertEqual(main(["compile", os.path.join(tmp_dir, "missing")]), 2)
+
+            # the compiled directory can be moved as long as the files keep their modification times
+            moved_dir = os.path.join(tmp_dir, "moved")
+            shutil.move(locales_dir, moved_dir)
+            bundle_dir = os.path.join(moved_dir, ".bundles")
+            clear_parse_cache()
+            with mock.patch.object(grammate.config.yaml, "safe_load") as safe_load:
+                config = load_locale_config("fr", locales_dir=moved_dir, bundle_dir=bundle_dir)
+                safe_load.assert_not_called()
+            self.assertIn(os.path.abspath(os.path.join(moved_dir, "fr.yaml")), config.sources)
+            self.assertEqual(config["greet"], "Hello {name}, [$key]")
+
+            # check_sources=False trusts the bundles of files whose modification times were not kept
+            os.utime(os.path.join(moved_dir, "fr.yaml"), ns=(0, 0))
+            with mock.patch.object(grammate.config.yaml, "safe_load") as safe_load:
+                config = load_locale_config("fr", locales_dir=moved_dir, bundle_dir=bundle_dir, check_sources=False)
+                safe_load.assert_not_called()
+            self.assertEqual(config["greet"], "Hello {name}, [$key]")
+            self.assertEqual(config.sources, {})
+            self.assertIn(os.path.abspath(os.path.join(moved_dir, "fr.yaml")),
+                          load_locale_config("fr", locales_dir=moved_dir, bundle_dir=bundle_dir).sources)
+
+    def test_load_locale_config_warm_templates(self):
+        with tempfile.TemporaryDirectory() as locales_dir:
+            with open(os.path.join(locales_dir, "en.yaml"), "w", encoding="utf-8") as f:
+                f.write("greeting: Hello {name}\nplain: Hello\nescaped: '\\[not a key]'\n"
+                        "list:\n  - '[greeting]'\n")
+
+            config = load_locale_config("en", locales_dir=locales_dir, warm_templates=True)
+            self.assertEqual(set(config.templates), {"Hello {name}", "\\[not a key]", "[greeting]"})
+            # static values need no substitution
+            self.assertEqual(config.templates["\\[not a key]"], (("[not a key]",), True))
+            self.assertFalse(config.templates["Hello {name}"][1])
+
+            locale = Locale(config, template_cache_size=0)
+            with mock.patch("grammate.model.locale.ExpressionParser") as parser:
+                self.assertEqual(locale.get_text("greeting", name="Bob"), "Hello Bob")
+                self.assertEqual(locale.get_text("escaped"), "[not a key]")
+                self.assertEqual(locale.get_text("list.0", name="Bob"), "Hello Bob")
+                parser.assert_not_called()
+
+            self.assertIsNone(load_locale_config("en", locales_dir=locales_dir).templates)
+
+    def test_load_locale_config_catalog(self):
+        with tempfile.TemporaryDirectory() as catalog_dir:
+            config = load_locale_config("ar_MA", locales_dir=TEST_LOCALES_DIR, flat_index=True)
+            catalog = load_locale_config("ar_MA", locales_dir=TEST_LOCALES_DIR, catalog_dir=catalog_dir)
+            self.assertIsInstance(catalog, MappedCatalog)
+            self.assertEqual(list(catalog), list(config))
+            # keys with non-canonical integer parts resolve as in ConfigDict
+            for key in list(config.index) + ["missing", "date.months.05", "month.plural.00", "date.week_day.01"]:
+                self.assertEqual(catalog[key], config[key])
+
+            catalog = load_locale_config("ar_MA", locales_dir=TEST_LOCALES_DIR, catalog_dir=catalog_dir)
+            self.assertEqual(catalog["date.months.5"], "ماي")
+            self.assertEqual(catalog["month.plural"], config["month.plural"])
+
+            # subtrees are stored as their keys: the file grows with the leaves, not with their depth
+            leaf = "x" * 10000
+            nested = {"leaf": leaf}
+            for i in range(10):
+                nested = {f"level{i}": nested, f"list{i}": [leaf[:10], {"a": 1}]}
+            catalog_path = os.path.join(catalog_dir, "nested.catalog")
+            self.assertTrue(write_catalog(catalog_path, ConfigDict(nested)))
+            self.assertLess(os.path.getsize(catalog_path), 2 * len(leaf))
+            catalog = MappedCatalog(catalog_path)
+            self.assertEqual(catalog["level9"], nested["level9"])
+            self.assertEqual(catalog["list9"], [leaf[:10], {"a": 1}])
+            catalog.close()
+
+    def test_load_locale_config_parse_cache(self):
+        clear_parse_cache()
+        safe_load = grammate.config.yaml.safe_load
+        with mock.patch.object(grammate.config.yaml, "safe_load", side_effect=safe_load) as patched:
+            configs = [load_locale_config(locale, locales_dir=TEST_LOCALES_DIR).config
+                       for locale in ("ar_MA", "ar", "ur", "ur", "fr", "en")]
+            # en, ar, ar_MA, ur and fr are each parsed once
+            self.assertEqual(patched.call_count, 5)
+
+        # parsed files are shared, not mutated
+        self.assertEqual(configs[2], configs[3])
+        self.assertEqual(load_locale_config("ar_MA", locales_dir=TEST_LOCALES_DIR).config, configs[0])
+        self.assertNotIn("$extends", load_locale_config("ar", locales_dir=TEST_LOCALES_DIR).config)
+
+        # subtrees handed out are copies, mutating them does not reach the shared parsed files
+        for flat_index in (False, True):
+            config = load_locale_config("ar", locales_dir=TEST_LOCALES_DIR, flat_index=flat_index)
+            months = config["date.months"]
+            config["date"]["months"].clear()
+            config["date.months"][1] = "x"
+            config["month.plural"].append("x")
+            for locale in ("ar", "ar_MA"):
+                reloaded = load_locale_config(locale, locales_dir=TEST_LOCALES_DIR, flat_index=flat_index)
+                self.assertEqual(len(reloaded["date.months"]), 12)
+                self.assertEqual(len(reloaded["month.plural"]), 5)
+            self.assertEqual(config["date.months"], months)
+
+        # edited files replace their previous version in the cache
+        with tempfile.TemporaryDirectory() as locales_dir:
+            yaml_path = os.path.join(locales_dir, "en.yaml")
+            for i in range(5):
+                with open(yaml_path, "w", encoding="utf-8") as f:
+                    f.write(f"greeting: Hello {i}\n")
+                self.assertEqual(load_locale_config("en", locales_dir=locales_dir)["greeting"], f"Hello {i}")
+            self.assertEqual(len(grammate.config._parse_cache), 6)
+            os.remove(yaml_path)
+            load_locale_config("en", locales_dir=locales_dir)
+            self.assertEqual(len(grammate.config._parse_cache), 5)
+
 
 if __name__ == "__main__":
     logging.basicConfig(stream=sys.stderr)
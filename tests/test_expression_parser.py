@@ -1,5 +1,7 @@
 import unittest
+import yaml
 from grammate import ExpressionParser, BraceExpression, BracketExpression
+from grammate.parser import parse_arguments
 
 
 class TestExpressionParser(unittest.TestCase):
@@ -102,6 +104,24 @@ class TestExpressionParser(unittest.TestCase):
         self.assertEqual(result[0].special, "!")
         self.assertEqual(result[0].args, ('apple', r'key\subkey', [1, 2, 3], None, 2, True))
 
+    def test_malformed_expressions(self):
+        result, resolved = self.parser.parse("Hello {name!} [$key] [!bad:'x] {unclosed")
+        self.assertEqual(self.parser.errors, ["{name!}", "[!bad:'x]", "{unclosed"])
+        self.assertEqual(result[:2], ["Hello ", "{name!}"])
+        self.assertFalse(resolved)
+
+        self.parser.parse("Hello {name}")
+        self.assertEqual(self.parser.errors, [])
+
+    def test_bracket_arguments(self):
+        expression = """[!adj:"apple", 'it''s', Yes, off, -3, 1.5, 0o7, 2021-05-04, hello world]"""
+        result, resolved = self.parser.parse(expression)
+        self.assertEqual(result[0].args, ('apple', "it's", True, False, -3, 1.5, '0o7',
+                                          yaml.safe_load('2021-05-04'), 'hello world'))
+
+        for args_string in ('$count, 1', "'a', \"b\"", 'null, ~, 07, 1_000, .5', '[1, 2], {a: 1}', 'a,'):
+            self.assertEqual(parse_arguments(args_string), tuple(yaml.safe_load(f"[{args_string}]")))
+
 
 if __name__ == '__main__':
     unittest.main()
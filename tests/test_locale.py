@@ -1,6 +1,10 @@
+import io
 import unittest
-from grammate import get_locale, Locale, ConfigDict
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from grammate import get_locale, Locale, ConfigDict, ProxyLocale, instrument, uninstrument
 from dataclasses import dataclass
+from datetime import date
 
 
 @dataclass
@@ -126,6 +130,10 @@ class TestLocale(unittest.TestCase):
         result = self.locale.get_text("shout")
         self.assertEqual(result, "HELLO")
 
+        # non string arguments
+        self.locale.register_modifier('repeat', lambda locale, text, count: text * count)
+        self.assertEqual(self.locale.get_text("[!repeat:ab,3]"), "ababab")
+
     def test_get_text_with_unknown_key_returns_key(self):
         result = self.locale.get_text("unknown_key")
         self.assertEqual(result, "unknown_key")
@@ -142,6 +150,380 @@ class TestLocale(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.locale.get_text("[!nonexistent:hello]")
 
+    def test_get_text_expansion(self):
+        # chained modifiers: only the output of the modifier is expanded again
+        self.locale.register_modifier('shout_of', lambda locale, key: f'[!uppercase:{key}]')
+        self.assertEqual(self.locale.get_text('[!shout_of:hi] {name}', name='[key1]'), 'HI Value1')
+        # escaped literals are not parsed a second time
+        self.assertEqual(self.locale.get_text(r'\[key1] [key1] \{name}', name='Bob'), '[key1] Value1 {name}')
+
+        self.locale.register_modifier('loop', lambda locale: '[!loop]')
+        with self.assertRaises(ValueError):
+            self.locale.get_text('[!loop]')
+        with self.assertRaises(ValueError):
+            self.locale.render_many([('[!loop]', None)])
+
+        self.locale.register_modifier('nest', lambda locale, n: f'[!nest:{n - 1}]' if n else 'done')
+        self.assertEqual(self.locale.get_text('[!nest:$n]', n=10), 'done')
+        self.locale.max_expansion_depth = 5
+        with self.assertRaises(ValueError):
+            self.locale.get_text('[!nest:$n]', n=10)
+        self.assertEqual(self.locale.get_text('[!nest:$n]', n=5), 'done')
+
+        # expression outputs (kwargs, modifier results) do not evict the cached templates of the configuration
+        self.locale.register_modifier('tagged', lambda locale, n: f'[key1] #{n}')
+        self.locale.get_text('[!tagged:$n] {name}', n=0, name='[key1]')
+        caches = self.locale.template_cache, self.locale.compiled_cache
+        sizes = [len(cache) for cache in caches]
+        for i in range(2000):
+            self.assertEqual(self.locale.get_text('[!tagged:$n] {name}', n=i, name=f'[user{i}]'),
+                             f'Value1 #{i} user{i}')
+        self.assertEqual([len(cache) for cache in caches], sizes)
+        self.assertIn('[!tagged:$n] {name}', caches[self.locale.compile_templates])
+
+    def test_template_cache(self):
+        self.locale.get_text("greeting", name="John")
+        self.assertIn('Hello {name}!', self.locale.template_cache)
+        template = self.locale.parse_template('Hello {name}!')
+        self.assertIs(self.locale.parse_template('Hello {name}!'), template)
+
+        # plain text is never cached
+        self.assertEqual(self.locale.parse_template('Hello John!'), (('Hello John!',), True))
+        self.assertNotIn('Hello John!', self.locale.template_cache)
+
+        # templates do not depend on the configuration, they are kept by reloads
+        self.locale.reload(ConfigDict({'greeting': 'Hi {name}!'}))
+        self.assertIs(self.locale.parse_template('Hello {name}!'), template)
+        self.assertEqual(self.locale.get_text("greeting", name="John"), "Hi John!")
+
+        # plain mappings have no prebuilt templates
+        en = Locale({'a': 'Hi {name}', 'b': '[a]'}, compile_templates=self.locale.compile_templates)
+        self.assertEqual(en.get_text('b', name='x'), 'Hi x')
+        ar = Locale({'c': '[b]'}, fallback_locale=en, compile_templates=self.locale.compile_templates)
+        instrumentation = instrument(ar)
+        self.assertEqual(ar.get_text('c', name='x'), 'Hi x')
+        self.assertGreater(instrumentation.snapshot()['counters']['parses'], 0)
+        uninstrument(ar)
+
+    def test_template_cache_size(self):
+        locale = Locale(ConfigDict({}), template_cache_size=2)
+        for name in ('a', 'b', 'c'):
+            locale.get_text(f"{{{name}}}")
+        self.assertEqual(len(locale.template_cache), 2)
+        self.assertNotIn('{a}', locale.template_cache)
+
+    def test_fallback_lookups(self):
+        en = Locale(ConfigDict({'greeting': 'Hello', 'farewell': 'Goodbye', 'count': 0, 'enabled': False}))
+        ar = Locale(ConfigDict({'greeting': 'أهلاً'}), fallback_locale=en)
+        ar_ma = Locale(ConfigDict({'greeting': 'مرحبا', 'empty': ''}), fallback_locale=ar)
+
+        self.assertEqual(ar_ma.lookup('greeting'), (0, 'مرحبا'))
+        self.assertEqual(ar_ma.lookup('farewell'), (2, 'Goodbye'))
+        self.assertEqual(ar_ma.lookup('missing'), (None, None))
+        self.assertEqual(ar_ma.get('missing', default='default'), 'default')
+        # falsy values are not misses
+        self.assertEqual(ar_ma.get('count', default=1), 0)
+        self.assertEqual(ar_ma.get('empty', default='default'), '')
+        # and non-string values are rendered as text
+        for compile_templates in (False, True):
+            ar_ma.compile_templates = compile_templates
+            self.assertEqual(ar_ma.get_text('count'), '0')
+            self.assertEqual(ar_ma.get_text('[count] [enabled]'), '0 False')
+            self.assertEqual(''.join(ar_ma.iter_text('[count]')), '0')
+            self.assertEqual(ar_ma.render_many([('count', None), ('[enabled]', None)]), ['0', 'False'])
+            self.assertEqual(ar_ma.render_columns('[$key]', dict(key=['count', 'enabled'])), ['0', 'False'])
+            self.assertEqual(ar_ma.render_columns('count', dict(key=[1])), ['0'])
+        ar_ma.compile_templates = False
+
+        # reloading any locale of the chain invalidates the lookups
+        en.reload(ConfigDict({'farewell': 'Bye', 'missing': 'found'}))
+        self.assertEqual(ar_ma.get('farewell'), 'Bye')
+        self.assertEqual(ar_ma.get('missing'), 'found')
+
+        ar.reload(ConfigDict({'farewell': 'الوداع'}))
+        self.assertEqual(ar_ma.lookup('farewell'), (1, 'الوداع'))
+
+        # a lookup running during a reload does not cache the value of the previous configuration
+        class ReloadingConfig(ConfigDict):
+            def get(self, key, default=None):
+                en.reload(ConfigDict({'farewell': 'Farewell'}))
+                return super().get(key, default)
+
+        en.reload(ReloadingConfig({'farewell': 'Goodbye'}))
+        self.assertEqual(en.lookup('farewell'), (0, 'Goodbye'))
+        self.assertEqual(en.lookup('farewell'), (0, 'Farewell'))
+        self.assertEqual(len(en.lookup_cache), 1)
+
+        # non-canonical spellings of a key all resolve, the lookup cache stays bounded
+        locale = Locale(ConfigDict({'list': ['a', 'b']}), lookup_cache_size=8)
+        for i in range(1, 50):
+            self.assertEqual(locale.get('list.' + '0' * i + '1'), 'b')
+        self.assertEqual(len(locale.lookup_cache), 8)
+
+    def test_render_many(self):
+        items = [
+            ('greeting', dict(name='John')),
+            ('price', dict(price=19.9)),
+            ('greeting', dict(name='Jane')),
+            ('shout', None),
+            ('nested', dict(name='Bob')),
+            ('unresolved', dict(name='Alice')),
+            ('{date:long}', dict(date=Date3(2021, 5, 4))),
+            ('plain_text', dict()),
+        ]
+        expected = [self.locale.get_text(key, **(kwargs or {})) for key, kwargs in items]
+        self.assertEqual(self.locale.render_many(items), expected)
+        self.assertEqual(self.locale.render_many(iter(items)), expected)
+        self.assertEqual(self.locale.render_many([]), [])
+
+    def test_iter_text(self):
+        for key, kwargs in [('greeting', dict(name='John')), ('shout', dict()), ('nested', dict(name='Bob')),
+                            ('unresolved', dict(name='Alice')), ('plain_text', dict())]:
+            self.assertEqual(''.join(self.locale.iter_text(key, **kwargs)), self.locale.get_text(key, **kwargs))
+
+        # expression outputs are expanded in place, without joining and parsing the whole text again
+        self.assertEqual(list(self.locale.iter_text('nested', name='[key1]')), ['Value1', ' and ', 'Value1'])
+        self.assertEqual(list(self.locale.iter_text(r'\[key1] [key1]')), ['[key1] ', 'Value1'])
+
+        buffer = io.StringIO()
+        self.assertEqual(self.locale.render_to(buffer, 'greeting', name='John'), len('Hello John!'))
+        self.assertEqual(buffer.getvalue(), 'Hello John!')
+
+        self.locale.register_modifier('loop', lambda locale: '[!loop]')
+        with self.assertRaises(ValueError):
+            ''.join(self.locale.iter_text('[!loop]'))
+
+        # expression outputs are not kept in the template cache
+        self.locale.register_modifier('large', lambda locale, n: '[key1] ' * n)
+        self.assertEqual(sum(map(len, self.locale.iter_text('[!large:$n]', n=1000))), len('Value1 ') * 1000)
+        self.assertNotIn('[key1] ' * 1000, self.locale.template_cache)
+
+        # the same depth limit as get_text
+        self.locale.register_modifier('nest', lambda locale, n: f'[!nest:{n - 1}]' if n else 'done')
+        self.locale.max_expansion_depth = 5
+        self.assertEqual(''.join(self.locale.iter_text('[!nest:$n]', n=5)), self.locale.get_text('[!nest:$n]', n=5))
+        for render in (self.locale.get_text, lambda *args, **kwargs: ''.join(self.locale.iter_text(*args, **kwargs))):
+            with self.assertRaises(ValueError):
+                render('[!nest:$n]', n=6)
+
+    def test_render_columns(self):
+        calls = list()
+
+        def tag(locale, text, *args):
+            calls.append((text,) + args)
+            return f"<{text}:{','.join(map(str, args))}>"
+
+        self.locale.register_modifier('tag', tag, pure=True)
+        columns = dict(name=['John', 'Jane', 'John', '[key1]'], level=[1, 2, 1, 1], key=['key1', 'x', 'key1', 'x'])
+        for key in ('greeting', 'nested', 'unresolved', 'shout', 'plain_text', '[!tag:$name,$level] [!tag:a,b]',
+                    '[$key] {level:03d}', '[!uppercase:$name]'):
+            expected = [self.locale.get_text(key, **dict(zip(columns, row))) for row in zip(*columns.values())]
+            self.assertEqual(self.locale.render_columns(key, columns), expected)
+            self.assertEqual(list(self.locale.render_columns(key, columns, lazy=True)), expected)
+
+        # pure modifiers are applied once per distinct arguments
+        calls.clear()
+        self.locale.pure_cache.clear()
+        self.locale.render_columns('[!tag:$name,$level] [!tag:a,b]', columns)
+        self.assertEqual(sorted(calls), [('Jane', 2), ('John', 1), ('[key1]', 1), ('a', 'b')])
+
+        # equal arguments of different types are distinct, falsy results are memoized too
+        calls.clear()
+        self.locale.register_modifier('type_name', lambda locale, value: calls.append(value) or type(value).__name__,
+                                      pure=True)
+        self.locale.register_modifier('empty', lambda locale, value: calls.append(value) or '', pure=True)
+        columns = dict(value=[1, True, 1.0, 1, True, 1.0])
+        self.assertEqual(self.locale.render_columns('[!type_name:$value][!empty:$value]', columns),
+                         ['int', 'bool', 'float'] * 2)
+        self.assertEqual(len(calls), 6)
+
+        # per batch, whatever the size of the pure cache, which is left untouched
+        calls.clear()
+        self.locale.pure_cache.clear()
+        names = [f'name{i % 50}' for i in range(200)]
+        self.locale.render_columns('[!tag:$name,$level]', dict(name=names, level=[1] * 200))
+        self.assertEqual(len(calls), 50)
+        self.assertEqual(len(self.locale.pure_cache), 0)
+
+        # values of pure formatters and builtin scalars are formatted once per distinct value
+        formatted = list()
+        self.locale.register_formatter(Locale.get_formatter_id(date), lambda obj, locale, fmt: formatted.append(obj) or
+                                       obj.strftime(fmt), pure=True)
+        dates = [date(2021, 5, i % 3 + 1) for i in range(9)]
+        self.assertEqual(self.locale.render_columns('{date:%d/%m}', dict(date=dates)),
+                         ['01/05', '02/05', '03/05'] * 3)
+        self.assertEqual(len(formatted), 3)
+        # unhashable values and types without pure formatters are formatted for each row
+        columns = dict(n=[1, True, 1.0], x=[bytearray(b'a'), bytearray(b'a'), bytearray(b'b')])
+        self.assertEqual(self.locale.render_columns('{n} {x}', columns),
+                         ["1 bytearray(b'a')", "True bytearray(b'a')", "1.0 bytearray(b'b')"])
+
+        # array-likes (e.g. numpy arrays) are converted to lists of python objects
+        self.assertEqual(self.locale.render_columns('{level:03d}', dict(level=array('i', [1, 2]))), ['001', '002'])
+
+        self.assertEqual(self.locale.render_columns('greeting', dict(name=[])), [])
+        with self.assertRaises(ValueError):
+            self.locale.render_columns('greeting', dict(name=['John'], level=[1, 2]))
+
+    def test_instrumentation(self):
+        en = Locale(ConfigDict({'farewell': 'Goodbye {name}', 'apple': 'apple'}))
+        ar = Locale(ConfigDict({'greeting': 'Hello {name} [!uppercase:$name]'}), fallback_locale=en,
+                    compile_templates=self.locale.compile_templates)
+        ar.register_modifier('uppercase', lambda locale, text: text.upper())
+        flushed = list()
+        instrumentation = instrument(ar)
+        instrumentation.callback = flushed.append
+
+        for _ in range(2):
+            ar.get_text('greeting', name='john')
+            ar.get_text('farewell', name='john')
+            ar.get_text('untranslated')
+            ar.format(Date3(2021, 5, 4))
+
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot['counters']['renders'], 6)
+        self.assertEqual(snapshot['counters']['lookups'], 6)
+        self.assertEqual(snapshot['counters']['lookup_cache_hits'], 2)
+        self.assertEqual(snapshot['counters']['misses'], 2)
+        self.assertEqual(snapshot['layers'], {0: 2, 1: 2})
+        self.assertEqual(snapshot['keys'], {'greeting': 2, 'farewell': 2, 'untranslated': 2})
+        self.assertEqual(snapshot['missing_keys'], {'untranslated': 2})
+        self.assertEqual(snapshot['modifiers']['uppercase']['calls'], 2)
+        self.assertGreater(snapshot['modifiers']['uppercase']['seconds'], 0)
+        self.assertEqual(snapshot['formatters']['builtins.str']['calls'], 4)
+        self.assertEqual(snapshot['formatters'][Locale.get_formatter_id(Date3)]['calls'], 2)
+        if ar.compile_templates:
+            self.assertEqual((snapshot['counters']['compiles'], snapshot['counters']['compiled_cache_hits']), (2, 2))
+        else:
+            self.assertEqual((snapshot['counters']['parses'], snapshot['counters']['template_cache_hits']), (2, 2))
+
+        self.assertEqual(instrumentation.flush(), snapshot)
+        self.assertEqual(flushed, [snapshot])
+        self.assertEqual(instrumentation.snapshot()['counters'], {})
+
+        # not instrumented locales are not wrapped at all
+        uninstrument(ar)
+        self.assertNotIn('lookup', vars(ar))
+        ar.get_text('greeting', name='john')
+        self.assertEqual(instrumentation.snapshot()['counters'], {})
+
+        # proxy locales instrument the locales they resolve to
+        class FixedProxyLocale(ProxyLocale):
+            def get_locale(s):
+                return ar
+
+        proxy = FixedProxyLocale()
+        instrumentation = instrument(proxy)
+        proxy.get_text('greeting', name='john')
+        self.assertEqual(instrumentation.snapshot()['counters']['proxy_resolutions'], 1)
+        self.assertEqual(instrumentation.snapshot()['counters']['renders'], 1)
+        uninstrument(proxy)
+        self.assertNotIn('lookup', vars(ar))
+
+        # formatters are recorded under the id they are registered with, subclasses included
+        @dataclass
+        class Date4(Date3):
+            pass
+
+        en.register_formatter(Locale.get_formatter_id(Date3), format_date3)
+        instrumentation = instrument(ar)
+        ar.format(Date4(2021, 5, 4))
+        self.assertEqual(list(instrumentation.snapshot()['formatters']), [Locale.get_formatter_id(Date3)])
+
+        # counters are updated under the lock snapshot copies them with
+        def render(_):
+            for _ in range(200):
+                ar.get_text('greeting', name='john')
+                instrumentation.snapshot()
+
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(render, range(4)))
+        self.assertEqual(instrumentation.snapshot()['counters']['renders'], 800)
+        self.assertEqual(instrumentation.snapshot()['keys']['greeting'], 800)
+        uninstrument(ar)
+
+    def test_pure_memoization(self):
+        calls = list()
+
+        def plural(locale, word, count):
+            calls.append((word, count))
+            return f"{count} {locale.get(word, default=word)}{'' if count == 1 else 's'}"
+
+        def format_date(obj, locale, fmt):
+            calls.append(obj)
+            return obj.strftime(fmt or '%Y-%m-%d')
+
+        self.locale.register_modifier('plural', plural, pure=True)
+        self.locale.register_formatter(Locale.get_formatter_id(date), format_date, pure=True)
+        for _ in range(3):
+            self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=2), "2 apples")
+            self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=2.0), "2.0 apples")
+            self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=True), "True apple")
+            self.assertEqual(self.locale.get_text("{date:%d/%m}", date=date(2021, 5, 4)), "04/05")
+            self.assertEqual(self.locale.format(date(2021, 5, 4), '%d/%m', formatter_id=Locale.get_formatter_id(date)),
+                             "04/05")
+        self.assertEqual(calls, [('apple', 2), ('apple', 2.0), ('apple', True), date(2021, 5, 4)])
+
+        # unhashable arguments are not memoized
+        self.assertEqual(self.locale.apply_modifier('plural', 'apple', [1]), "[1] apples")
+
+        # reloading the locale clears the memoized results
+        calls.clear()
+        self.locale.reload(ConfigDict({'apple': 'pomme'}))
+        self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=2), "2 pommes")
+        self.assertEqual(calls, [('apple', 2)])
+
+        # a result computed during a reload is not memoized
+        def reloading_plural(locale, word, count):
+            result = plural(locale, word, count)
+            locale.reload(ConfigDict({'apple': 'poire'}))
+            return result
+
+        self.locale.register_modifier('plural', reloading_plural, pure=True)
+        self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=3), "3 pommes")
+        self.assertEqual(self.locale.get_text("[!plural:apple,$count]", count=3), "3 poires")
+        self.locale.register_modifier('plural', plural, pure=True)
+
+        # impure modifiers are called every time
+        calls.clear()
+        self.locale.register_modifier('plural', plural)
+        self.locale.get_text("[!plural:apple,$count]", count=2)
+        self.locale.get_text("[!plural:apple,$count]", count=2)
+        self.assertEqual(len(calls), 2)
+
+    def test_formatter_dispatch(self):
+        @dataclass
+        class Date4(Date3):
+            pass
+
+        child = Locale(ConfigDict({'date': {'long': 'long {day}/{month}/{year}'}}), fallback_locale=self.locale)
+        # formatters registered for a base class apply to subclasses
+        self.assertEqual(child.format(Date4(2021, 5, 4), 'long'), 'long 4/5/2021')
+        self.assertIs(child.format_dispatch[Date4], format_date3)
+
+        # registering in any locale of the chain rebuilds the dispatch table
+        self.locale.register_formatter(Locale.get_formatter_id(Date4), lambda obj, locale, fmt: 'date4')
+        self.assertNotIn(Date4, child.format_dispatch)
+        self.assertEqual(child.format(Date4(2021, 5, 4), 'long'), 'date4')
+        self.assertEqual(child.format(None), 'None')
+
+        self.assertEqual(child.apply_modifier('uppercase', 'hello'), 'HELLO')
+        self.locale.register_modifier('uppercase', lambda locale, text: text.title())
+        self.assertEqual(child.apply_modifier('uppercase', 'hello'), 'Hello')
+
+
+class TestCompiledLocale(TestLocale):
+    def setUp(self):
+        super().setUp()
+        self.locale.compile_templates = True
+
+    def test_compiled_cache(self):
+        self.assertEqual(self.locale.get_text("greeting", name="John"), "Hello John!")
+        self.assertIn('Hello {name}!', self.locale.compiled_cache)
+        render, resolved = self.locale.compile_template('Hello {name}!')
+        self.assertFalse(resolved)
+        self.assertEqual(render(self.locale, dict(name='Bob')), 'Hello Bob!')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,17 @@
+import asyncio
 import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 from grammate import get_locale, get_text, setup_locale, ProxyLocale, Locale, register_modifier, \
-    modifier, formatter
+    modifier, formatter, preload_locales, reload_changed_locales, ContextLocale, use_locale, \
+    render_many
+from grammate.setup import setup
 from dataclasses import dataclass
 from datetime import date
 
@@ -335,6 +345,232 @@ class TestLocale(unittest.TestCase):
         result = get_text(expression, thing='notebook', adj='red')
         self.assertEqual(result, "عندي دفتر أحمر!")
 
+    def test_preload_locales(self):
+        timings = preload_locales()
+        for locale_id in ('en', 'ar', 'ar_MA', 'fr', 'ur'):
+            self.assertIsInstance(get_locale(locale_id), Locale)
+        for locale_id, timing in timings.items():
+            self.assertGreaterEqual(timing, 0)
+        self.assertIs(get_locale('ar_MA').fallback_locale, get_locale('ar'))
+
+        self.current_locale = 'ar_MA'
+        self.assertEqual(get_text("{date:long}", date=Date1(2021, 5, 4)), "الثلاثاء، 04 ماي 2021")
+
+    def test_reload_changed_locales(self):
+        get_locale('en')
+        with tempfile.TemporaryDirectory() as locales_dir:
+            def write(locale_id, content, mtime):
+                path = os.path.join(locales_dir, f'{locale_id}.yaml')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.utime(path, (mtime, mtime))
+
+            write('zz', 'greeting: "Hi"\nfarewell: "Bye"\n', 1)
+            write('zz_YY', 'greeting: "Yo"\n', 1)
+            setup(locales_dir=locales_dir)
+            try:
+                zz_yy = get_locale('zz_YY')
+                modifiers = dict(zz_yy.modifiers)
+                self.assertEqual(zz_yy.get_text('[greeting], [farewell]!'), 'Yo, Bye!')
+                self.assertEqual(reload_changed_locales(), [])
+
+                # a change in the parent reloads every locale built from it
+                write('zz', 'greeting: "Hi"\nfarewell: "Ciao"\n', 2)
+                self.assertEqual(sorted(reload_changed_locales()), ['zz', 'zz_YY'])
+                self.assertIs(get_locale('zz_YY'), zz_yy)
+                self.assertEqual(zz_yy.modifiers, modifiers)
+                self.assertEqual(zz_yy.get_text('[greeting], [farewell]!'), 'Yo, Ciao!')
+            finally:
+                from grammate.globals import _locales
+                _locales.pop('zz', None)
+                _locales.pop('zz_YY', None)
+                setup()
+
+    def test_concurrent_get_locale(self):
+        import grammate.config
+        from grammate.globals import _locales
+
+        get_locale('en')
+        load_locale_config = grammate.config.load_locale_config
+        loads = Counter()
+
+        def slow_load_locale_config(locale_id, *args, **kwargs):
+            loads[locale_id] += 1
+            time.sleep(0.01)  # widen the race window
+            return load_locale_config(locale_id, *args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as locales_dir:
+            for locale_id in ('zz', 'zz_YY', 'zz_XX'):
+                with open(os.path.join(locales_dir, f'{locale_id}.yaml'), 'w', encoding='utf-8') as f:
+                    f.write(f'name: "{locale_id}"\n')
+            setup(locales_dir=locales_dir)
+            barrier = threading.Barrier(24)
+            results, errors = list(), list()
+
+            def worker(i):
+                try:
+                    barrier.wait()
+                    locale = get_locale(('zz', 'zz_YY', 'zz_XX')[i % 3])
+                    results.append((locale, locale.get_text('[name]')))
+                except Exception as e:
+                    errors.append(e)
+
+            try:
+                with mock.patch('grammate.config.load_locale_config', slow_load_locale_config):
+                    threads = [threading.Thread(target=worker, args=(i,)) for i in range(barrier.parties)]
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+
+                self.assertEqual(errors, [])
+                self.assertEqual(loads, Counter(zz=1, zz_YY=1, zz_XX=1))
+                self.assertEqual(len(set(map(id, (locale for locale, _ in results)))), 3)
+                for locale, name in results:
+                    self.assertIs(get_locale(name), locale)
+                self.assertIs(get_locale('zz_YY').fallback_locale, get_locale('zz'))
+                self.assertIs(get_locale('zz_XX').fallback_locale, get_locale('zz'))
+            finally:
+                for locale_id in ('zz', 'zz_YY', 'zz_XX'):
+                    _locales.pop(locale_id, None)
+                setup()
+
+    def test_circular_fallback_chain(self):
+        import grammate.config
+        from grammate.globals import _locales
+
+        with tempfile.TemporaryDirectory() as locales_dir:
+            for locale_id in ('yy', 'yy_ZZ'):
+                with open(os.path.join(locales_dir, f'{locale_id}.yaml'), 'w', encoding='utf-8') as f:
+                    f.write(f'name: "{locale_id}"\n')
+            # yy falls back on the default locale yy_ZZ, which falls back on its language yy
+            setup(default_locale='yy_ZZ', locales_dir=locales_dir)
+            errors = list()
+
+            def worker(locale_id):
+                try:
+                    get_locale(locale_id)
+                except RuntimeError as e:
+                    errors.append(e)
+
+            try:
+                # threads loading both ends of the cycle fail instead of waiting on each other
+                threads = [threading.Thread(target=worker, args=(locale_id,), daemon=True)
+                           for locale_id in ('yy', 'yy_ZZ') * 4]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join(timeout=5)
+                self.assertEqual(len(errors), len(threads))
+                self.assertNotIn('yy', _locales)
+
+                # fr -> ur and ur -> fr requested from two threads: each loads one locale and then waits on the other
+                for locale_id in ('xd', 'xa', 'xb'):
+                    with open(os.path.join(locales_dir, f'{locale_id}.yaml'), 'w', encoding='utf-8') as f:
+                        f.write(f'name: "{locale_id}"\n')
+                setup(default_locale='xd', locales_dir=locales_dir)
+                get_locale('xd')
+                barrier, errors = threading.Barrier(2), list()
+                load_locale_config = grammate.config.load_locale_config
+
+                def slow_load_locale_config(locale_id, *args, **kwargs):
+                    barrier.wait(timeout=5)  # both threads are loading before any of them loads its fallback
+                    return load_locale_config(locale_id, *args, **kwargs)
+
+                def cross_worker(locale_id, fallback_locale_id):
+                    try:
+                        get_locale(locale_id, fallback_locale_id=fallback_locale_id)
+                    except RuntimeError as e:
+                        errors.append(e)
+
+                with mock.patch('grammate.config.load_locale_config', slow_load_locale_config):
+                    threads = [threading.Thread(target=cross_worker, args=args, daemon=True)
+                               for args in (('xa', 'xb'), ('xb', 'xa'))]
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join(timeout=5)
+                self.assertFalse(any(thread.is_alive() for thread in threads))
+                self.assertTrue(errors)
+                # the failed loads can be retried
+                self.assertEqual(get_locale('xa', fallback_locale_id='xb').fallback_locale, get_locale('xb'))
+            finally:
+                for locale_id in ('xd', 'xa', 'xb'):
+                    _locales.pop(locale_id, None)
+                setup(default_locale='en')
+
+    def test_render_many(self):
+        self.current_locale = 'ar'
+        items = [("plain_text", None), ("[!plural:apple,$count]", dict(count=3)),
+                 ("[!plural:apple,$count]", dict(count=1))]
+        self.assertEqual(render_many(items), [get_text(key, **(kwargs or {})) for key, kwargs in items])
+        self.assertEqual(render_many(items, locale='en'), ["plain_text", "3 apples", "1 apple"])
+
+    def test_use_locale(self):
+        self.current_locale = 'en'
+        with use_locale('ar') as locale:
+            self.assertIs(locale, get_locale('ar'))
+            self.assertEqual(get_text("plain_text"), "نص عادي")
+            with use_locale(get_locale('en')):
+                self.assertEqual(get_text("plain_text"), "plain_text")
+            self.assertEqual(get_text("plain_text"), "نص عادي")
+        self.assertEqual(get_text("plain_text"), "plain_text")
+
+        @use_locale('ar')
+        def render():
+            return get_text("plain_text")
+
+        self.assertEqual(render(), "نص عادي")
+        self.assertEqual(get_text("plain_text"), "plain_text")
+
+    def test_context_locale(self):
+        setup_locale(ContextLocale(default_locale='en'))
+
+        @use_locale('ar')
+        async def render_ar():
+            await asyncio.sleep(0)
+            return get_text("plain_text")
+
+        async def render(locale_id):
+            with use_locale(locale_id):
+                await asyncio.sleep(0)
+                return ContextLocale().get_text("plain_text")
+
+        async def main():
+            return await asyncio.gather(render_ar(), render('en'), render('ar'))
+
+        self.assertEqual(asyncio.run(main()), ["نص عادي", "plain_text", "نص عادي"])
+        self.assertEqual(get_text("plain_text"), "plain_text")
+        self.assertEqual(ContextLocale().get_text("plain_text"), "plain_text")
+
+    def test_shared_binding(self):
+        setup_locale(ContextLocale(default_locale='en'))
+        binding = use_locale('ar')
+        barrier = threading.Barrier(4)
+
+        def render(_):
+            with binding:
+                barrier.wait(timeout=5)
+                text = get_text("plain_text")
+                barrier.wait(timeout=5)
+            return text, get_text("plain_text")
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(render, range(4)))
+        self.assertEqual(results, [("نص عادي", "plain_text")] * 4)
+
+        async def render_task(delay):
+            with binding:
+                await asyncio.sleep(delay)
+                text = get_text("plain_text")
+            return text, get_text("plain_text")
+
+        async def main():
+            return await asyncio.gather(render_task(0.01), render_task(0))
+
+        self.assertEqual(asyncio.run(main()), [("نص عادي", "plain_text")] * 2)
+        self.assertEqual(get_text("plain_text"), "plain_text")
+
 
 if __name__ == '__main__':
     unittest.main()